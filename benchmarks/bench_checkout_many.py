@@ -0,0 +1,46 @@
+"""
+Per-basket cost of checkout_many, and of the NumPy batch engine when
+numpy is installed, against a Python loop over checkout.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_checkout_many.py
+"""
+import timeit
+
+from bench_utils import random_baskets
+from solutions.CHK import checkout_solution
+
+try:
+    from solutions.CHK import checkout_numpy
+except ImportError:
+    checkout_numpy = None
+
+
+def per_basket_micros(function, baskets):
+    return min(timeit.repeat(
+        lambda: function(baskets), number=1, repeat=3)) / len(baskets) * 1e6
+
+
+def main():
+    engines = [
+        ('loop', lambda baskets: [
+            checkout_solution.checkout(skus) for skus in baskets]),
+        ('batch', checkout_solution.checkout_many),
+    ]
+    if checkout_numpy is not None:
+        engines.append(('numpy', checkout_numpy.checkout_many))
+
+    for count, max_size in ((100000, 20), (100000, 200)):
+        baskets = random_baskets(count, max_size=max_size)
+        expected = engines[0][1](baskets)
+        timings = []
+        for name, function in engines:
+            assert function(baskets) == expected, name
+            timings.append('%s %.2fus' % (
+                name, per_basket_micros(function, baskets)))
+        print('%d baskets of up to %d items: %s per basket' % (
+            count, max_size, ', '.join(timings)))
+
+
+if __name__ == '__main__':
+    main()
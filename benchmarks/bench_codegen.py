@@ -0,0 +1,48 @@
+"""
+Generated pricing function against the interpreted pricing paths on
+already counted baskets of a few sizes.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_codegen.py
+"""
+from bench_utils import per_call_micros, random_basket, random_baskets
+from solutions.CHK import checkout_codegen
+from solutions.CHK import checkout_solution
+
+
+def interpreted_deals(counts, catalog):
+    deals_cost, counts = checkout_solution.evaluate_deals(
+        counts, catalog.ordered_deals)
+    return deals_cost + checkout_solution.evaluate_remaining_items(
+        counts, catalog.prices)
+
+
+def main():
+    catalog = checkout_solution.get_catalog()
+    price = checkout_codegen.get_pricer(catalog)
+
+    print('%-10s %16s %14s %14s' % (
+        'basket', 'evaluate_deals', 'price_counts', 'generated'))
+    for size in (1, 10, 100, 10000):
+        counts = catalog.tokenizer.count(random_basket(size))
+        assert price(counts) == \
+            checkout_solution.price_counts(list(counts), catalog)
+        deals = per_call_micros(
+            lambda: interpreted_deals(list(counts), catalog))
+        compiled = per_call_micros(
+            lambda: checkout_solution.price_counts(list(counts), catalog))
+        generated = per_call_micros(lambda: price(counts))
+        print('%-10d %14.2fus %12.2fus %12.2fus (%.1fx evaluate_deals)' % (
+            size, deals, compiled, generated, deals / generated))
+
+    baskets = random_baskets(10000)
+    batch = per_call_micros(
+        lambda: checkout_solution.checkout_many(baskets), number=5) / 1e3
+    generated = per_call_micros(
+        lambda: checkout_codegen.checkout_many(baskets), number=5) / 1e3
+    print('checkout_many of %d baskets: %.1fms, generated %.1fms' % (
+        len(baskets), batch, generated))
+
+
+if __name__ == '__main__':
+    main()
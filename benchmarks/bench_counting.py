@@ -0,0 +1,46 @@
+"""
+Basket counting kernel against collections.Counter on short, medium
+and very long baskets.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_counting.py
+"""
+from collections import Counter
+import timeit
+
+from bench_utils import random_basket
+from solutions.CHK import checkout_solution
+
+
+def counter_count_items(skus, sku_index):
+    """
+    Counting as done before the kernel: Counter then map to vector
+    """
+    counts = [0] * len(sku_index)
+    for item, quantity in Counter(skus).items():
+        index = sku_index.get(item)
+        if index is None:
+            return None
+        counts[index] = quantity
+    return counts
+
+
+def main():
+    sku_index = checkout_solution.get_catalog().sku_index
+    for size, number in ((10, 100000), (1000, 2000), (10000000, 1)):
+        skus = random_basket(size)
+        assert counter_count_items(skus, sku_index) == \
+            checkout_solution.count_items(skus, sku_index)
+
+        counter = min(timeit.repeat(
+            lambda: counter_count_items(skus, sku_index),
+            number=number, repeat=3)) / number
+        kernel = min(timeit.repeat(
+            lambda: checkout_solution.count_items(skus, sku_index),
+            number=number, repeat=3)) / number
+        print('%9d items: Counter %10.2fus, kernel %10.2fus (%.1fx)' % (
+            size, counter * 1e6, kernel * 1e6, counter / kernel))
+
+
+if __name__ == '__main__':
+    main()
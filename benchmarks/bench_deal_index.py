@@ -0,0 +1,69 @@
+"""
+Deal evaluation through the SKU -> deals index against walking every
+deal, on a synthetic catalog of 3250 "get one free" deals.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_deal_index.py
+"""
+import os
+import shutil
+import string
+import tempfile
+
+from bench_utils import per_call_micros
+from solutions.CHK import checkout_solution
+
+
+def write_large_catalog(path):
+    """
+    Every SKU gets "nX get one Y free" deals for every other SKU Y
+    """
+    with open(path, 'w') as prices_file:
+        for price, item in enumerate(string.ascii_uppercase, 10):
+            deals = [
+                '%d%s get one %s free' % (quantity, item, free_item)
+                for quantity in range(1, 6)
+                for free_item in string.ascii_uppercase if free_item != item
+            ]
+            prices_file.write('%s;%d;%s\n' % (item, price, ', '.join(deals)))
+
+
+def walk_all_deals(counts, catalog):
+    deals_cost, counts = checkout_solution.evaluate_deals(
+        counts, catalog.interacting_deals)
+    return deals_cost + checkout_solution.evaluate_remaining_items(
+        counts, catalog.prices)
+
+
+def indexed_deals(counts, catalog, deal_index):
+    deals_cost, counts = checkout_solution.evaluate_deals(
+        counts, deal_index.candidates(counts))
+    return deals_cost + checkout_solution.evaluate_remaining_items(
+        counts, catalog.prices)
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'prices.csv')
+        write_large_catalog(path)
+        catalog = checkout_solution.compile_catalog(path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    deal_index = checkout_solution.DealIndex(catalog.interacting_deals)
+    print('%d interacting deals' % len(catalog.interacting_deals))
+    for skus in ('A', 'AAB', 'AAABBBCCCDDD', string.ascii_uppercase * 2):
+        counts = checkout_solution.count_items(skus, catalog.sku_index)
+        assert walk_all_deals(list(counts), catalog) == \
+            indexed_deals(list(counts), catalog, deal_index)
+        walk = per_call_micros(
+            lambda: walk_all_deals(list(counts), catalog), number=50)
+        index = per_call_micros(
+            lambda: indexed_deals(list(counts), catalog, deal_index), number=50)
+        print('%-52s all deals %9.1fus, indexed %9.1fus (%.1fx)' % (
+            skus, walk, index, walk / index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-checkout cost of the original pricing path (prices.csv re-read and
+every deal re-parsed and re-sorted on each call) against the compiled
+catalog and deal table.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_deal_plan.py
+"""
+from collections import Counter
+
+from bench_utils import per_call_micros
+from solutions.CHK import checkout_solution
+
+
+BASKETS = [
+    "A",
+    "ABCD",
+    "AAAABBBC",
+    "EEBFFFNNNMRRRQ",
+    "AAAAAHHHHHHHHHHVVVKKPPPPPUUUU",
+]
+
+
+def legacy_checkout(skus):
+    """
+    Pricing as done before the catalog was compiled: load, parse and
+    sort on every call, then apply deals one at a time on a Counter
+    """
+    if not skus:
+        return 0
+
+    item_prices, item_deals = checkout_solution.load_prices()
+    items_counter = Counter(skus)
+    ordered_deals = checkout_solution.get_ordered_deals(
+        item_prices, item_deals)
+
+    total_cost = 0
+    for (deal, requirements, saving, deal_cost) in ordered_deals:
+        ctr = 10
+        while ctr > 0 and checkout_solution.requirements_satisfied(
+            items_counter, requirements
+        ):
+            ctr -= 1
+            total_cost += deal_cost
+            items_counter -= requirements
+
+    for item, quantity in items_counter.items():
+        if item not in item_prices:
+            return -1
+        total_cost += item_prices[item] * quantity
+
+    return total_cost
+
+
+def main():
+    print('%-32s %12s %12s %8s' % ('basket', 'before (us)', 'after (us)', 'speedup'))
+    for skus in BASKETS:
+        assert legacy_checkout(skus) == checkout_solution.checkout(skus), skus
+        before = per_call_micros(lambda: legacy_checkout(skus), number=500)
+        after = per_call_micros(lambda: checkout_solution.checkout(skus))
+        print('%-32s %12.2f %12.2f %7.1fx' % (
+            skus, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Throughput of the process pool batch engine on 1M synthetic baskets
+for an increasing number of worker processes.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/bench_parallel.py [baskets]
+"""
+import multiprocessing
+import sys
+import time
+
+from bench_utils import random_baskets
+from solutions.CHK import checkout_parallel
+from solutions.CHK import checkout_solution
+
+
+def main(count):
+    baskets = random_baskets(count, max_size=30)
+
+    start = time.time()
+    expected = checkout_solution.checkout_many(baskets)
+    serial = time.time() - start
+    print('checkout_many: %.2fs (%.0f baskets/s)' % (serial, count / serial))
+
+    processes = 1
+    while processes <= multiprocessing.cpu_count():
+        start = time.time()
+        totals = checkout_parallel.checkout_parallel(
+            baskets, processes=processes)
+        elapsed = time.time() - start
+        assert totals == expected
+        print('%2d processes: %.2fs (%.0f baskets/s, %.2fx serial)' % (
+            processes, elapsed, count / elapsed, serial / elapsed))
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
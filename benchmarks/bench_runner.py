@@ -0,0 +1,159 @@
+"""
+End to end throughput of the queue runners against a local broker.
+
+Feeds generated checkout requests through runner.local_broker to the
+tdl QueueBasedImplementationRunner and to the concurrent runner with a
+few worker and in-flight window sizes, so the whole dispatch path is
+timed: STOMP frames, request parsing, processing rules, checkout and
+publishing the response. Latency is measured by the broker, from
+sending a request to the runner until its response arrives.
+
+Run from the repository root (needs tdl-client-python):
+    PYTHONPATH=lib python benchmarks/bench_runner.py [requests]
+"""
+import json
+import sys
+import threading
+
+from bench_utils import random_baskets
+from runner.concurrent_runner import ConcurrentImplementationRunnerBuilder
+from runner.latency_stats import format_summary, summarise
+from runner.local_broker import LocalBroker
+from solutions.CHK import checkout_solution
+from tdl.queue.implementation_runner_config import ImplementationRunnerConfig
+from tdl.queue.queue_based_implementation_runner import \
+    QueueBasedImplementationRunnerBuilder
+
+
+REQUEST_QUEUE = 'bench.req'
+RESPONSE_QUEUE = 'bench.resp'
+
+
+class QuietAuditStream(object):
+    """
+    Audit stream that drops the runner's per request log lines
+    """
+
+    @staticmethod
+    def log(value):
+        pass
+
+
+def runner_config(port):
+    return ImplementationRunnerConfig()\
+        .set_hostname('127.0.0.1')\
+        .set_port(port)\
+        .set_request_queue_name(REQUEST_QUEUE)\
+        .set_response_queue_name(RESPONSE_QUEUE)\
+        .set_audit_stream(QuietAuditStream)
+
+
+def checkout_requests(count, seed=0):
+    """
+    Returns `count` checkout requests as (id, method, params) with
+    random baskets
+    """
+    return [
+        ('CHK_R1_%06d' % number, 'checkout', [skus])
+        for number, skus in enumerate(
+            random_baskets(count, max_size=30, seed=seed))
+    ]
+
+
+def run_requests(create_runner, requests, prefetch=1):
+    """
+    Runs a runner against a local broker until it stops on its idle
+    timeout, and collects the responses to requests. A warm-up request
+    is answered first so every timed request finds the runner
+    subscribed and ready.
+    Args:
+        create_runner (function): config -> runner with a run() method
+        requests (list(tuple)): (id, method, params) of each request
+        prefetch (int): unacknowledged requests the broker sends at once
+    Returns:
+        (list(tuple)): (request id, result) of each response in the
+            order they were published
+        (dict): summary from runner.latency_stats.summarise
+    """
+    with LocalBroker(prefetch=prefetch) as broker:
+        runner_thread = threading.Thread(
+            target=create_runner(runner_config(broker.port)).run)
+        runner_thread.start()
+
+        _, method, params = requests[0]
+        broker.enqueue(REQUEST_QUEUE, json.dumps(
+            {'method': method, 'params': params, 'id': 'warm-up'}))
+        if not broker.wait_for_messages(RESPONSE_QUEUE, 1, timeout=30):
+            raise RuntimeError('runner did not answer the warm-up request')
+        broker.messages(RESPONSE_QUEUE)
+
+        message_ids = {}
+        for request_id, method, params in requests:
+            message_id = broker.enqueue(REQUEST_QUEUE, json.dumps(
+                {'method': method, 'params': params, 'id': request_id}))
+            message_ids[request_id] = message_id
+
+        runner_thread.join()
+        responses = broker.messages(RESPONSE_QUEUE)
+
+    results = []
+    latencies = []
+    for response in responses:
+        decoded = json.loads(response.body.decode('utf-8'))
+        results.append((decoded['id'], decoded['result']))
+        delivered_at = broker.delivered_at[message_ids[decoded['id']]]
+        latencies.append(response.enqueued_at - delivered_at)
+
+    elapsed = 0.0
+    if responses:
+        first_delivery = broker.delivered_at[message_ids[requests[0][0]]]
+        elapsed = responses[-1].enqueued_at - first_delivery
+    return results, summarise(latencies, elapsed)
+
+
+def create_tdl_runner(config):
+    return QueueBasedImplementationRunnerBuilder()\
+        .set_config(config)\
+        .with_solution_for('checkout', checkout_solution.checkout)\
+        .create()
+
+
+def concurrent_runner_factory(workers, max_in_flight, processes=True):
+    def create_runner(config):
+        return ConcurrentImplementationRunnerBuilder()\
+            .set_config(config)\
+            .with_workers(workers, processes)\
+            .with_max_in_flight(max_in_flight)\
+            .with_solution_for('checkout', checkout_solution.checkout)\
+            .create()
+    return create_runner
+
+
+def check_results(requests, results):
+    expected = [
+        (request_id, checkout_solution.checkout(*params))
+        for request_id, _, params in requests
+    ]
+    assert results == expected, \
+        'runner results differ from checkout or are out of order'
+
+
+def main(count):
+    requests = checkout_requests(count)
+    checkout_solution.get_catalog()
+    results, summary = run_requests(create_tdl_runner, requests)
+    check_results(requests, results)
+    print('%-36s %s' % ('tdl runner:', format_summary(summary)))
+
+    for workers in (1, 2, 4):
+        for max_in_flight in (workers, 4 * workers):
+            results, summary = run_requests(
+                concurrent_runner_factory(workers, max_in_flight), requests)
+            check_results(requests, results)
+            print('%-36s %s' % (
+                '%d worker(s), %d in flight:' % (workers, max_in_flight),
+                format_summary(summary)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,137 @@
+"""
+Time to first response of a freshly started runner process.
+
+Starts a runner in a new Python process against a local broker that
+already holds one checkout request, and times from starting the
+process until the response arrives.
+- eager imports the tdl client and every solution module up front,
+  as send_command_to_server.py used to.
+- lazy registers LazySolutions and warms them up in the background
+  before importing tdl, as send_command_to_server.py does now.
+
+Run from the repository root (needs tdl-client-python):
+    PYTHONPATH=lib python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+REQUEST_QUEUE = 'startup.req'
+RESPONSE_QUEUE = 'startup.resp'
+MODES = ('eager', 'lazy')
+
+
+def run_runner(mode, port):
+    """
+    Runs in the child process: builds the runner the given way and
+    runs it until it goes idle
+    """
+    if mode == 'eager':
+        from tdl.queue.queue_based_implementation_runner import \
+            QueueBasedImplementationRunnerBuilder
+        from solutions.SUM import sum_solution
+        from solutions.HLO import hello_solution
+        from solutions.FIZ import fizz_buzz_solution
+        from solutions.CHK import checkout_solution
+        solutions = (
+            ('sum', sum_solution.compute),
+            ('hello', hello_solution.hello),
+            ('fizz_buzz', fizz_buzz_solution.fizz_buzz),
+            ('checkout', checkout_solution.checkout),
+        )
+    else:
+        from runner.solution_registry import LazySolution, warm_up
+        solutions = (
+            ('sum', LazySolution('solutions.SUM.sum_solution:compute')),
+            ('hello', LazySolution('solutions.HLO.hello_solution:hello')),
+            ('fizz_buzz', LazySolution(
+                'solutions.FIZ.fizz_buzz_solution:fizz_buzz')),
+            ('checkout', LazySolution(
+                'solutions.CHK.checkout_solution:checkout',
+                warm_up='solutions.CHK.checkout_solution:'
+                        'start_catalog_watcher')),
+        )
+        warm_up([solution for _, solution in solutions], background=True)
+        from tdl.queue.queue_based_implementation_runner import \
+            QueueBasedImplementationRunnerBuilder
+
+    from tdl.queue.implementation_runner_config import \
+        ImplementationRunnerConfig
+
+    class QuietAuditStream(object):
+        @staticmethod
+        def log(value):
+            pass
+
+    config = ImplementationRunnerConfig()\
+        .set_hostname('127.0.0.1')\
+        .set_port(port)\
+        .set_request_queue_name(REQUEST_QUEUE)\
+        .set_response_queue_name(RESPONSE_QUEUE)\
+        .set_audit_stream(QuietAuditStream)
+    builder = QueueBasedImplementationRunnerBuilder().set_config(config)
+    for method_name, solution in solutions:
+        builder.with_solution_for(method_name, solution)
+    builder.create().run()
+
+
+def time_to_first_response(mode):
+    """
+    Returns seconds from starting a runner process until its first
+    response reaches the broker
+    """
+    from runner.latency_stats import clock
+    from runner.local_broker import LocalBroker
+
+    with LocalBroker() as broker:
+        broker.enqueue(REQUEST_QUEUE, json.dumps({
+            'method': 'checkout', 'params': ['AAABBEE'], 'id': 'CHK_R1_001'}))
+        start = clock()
+        # the tdl client logs tracebacks from its timer threads when the
+        # child exits, the response is checked here instead
+        with open(os.devnull, 'w') as devnull:
+            child = subprocess.Popen([
+                sys.executable, os.path.abspath(__file__),
+                '--child', mode, str(broker.port)], stderr=devnull)
+        try:
+            if not broker.wait_for_messages(RESPONSE_QUEUE, 1, timeout=60):
+                raise RuntimeError('%s runner did not respond' % mode)
+            # the broker's arrival time, waking up from the wait can lag
+            message = broker.messages(RESPONSE_QUEUE)[0]
+            elapsed = message.enqueued_at - start
+            response = json.loads(message.body.decode('utf-8'))
+            assert response['result'] == 240, response
+        finally:
+            child.wait()
+    return elapsed
+
+
+def interpreter_start():
+    from runner.latency_stats import clock
+
+    start = clock()
+    subprocess.check_call([sys.executable, '-c', 'pass'])
+    return clock() - start
+
+
+def main(runs):
+    print('interpreter start: %.1fms' % (
+        min(interpreter_start() for _ in range(runs)) * 1e3))
+    timings = dict((mode, []) for mode in MODES)
+    for _ in range(runs):
+        # alternate modes so both see the same disk cache and load
+        for mode in MODES:
+            timings[mode].append(time_to_first_response(mode))
+    for mode in MODES:
+        values = sorted(timings[mode])
+        print('%-6s first response: best %.1fms, median %.1fms' % (
+            mode, values[0] * 1e3, values[len(values) // 2] * 1e3))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_runner(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,38 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import random
+import string
+import timeit
+
+
+def per_call_micros(function, number=2000, repeat=5):
+    """
+    Best of `repeat` runs, in microseconds per call to function
+    """
+    timings = timeit.repeat(function, number=number, repeat=repeat)
+    return min(timings) / number * 1e6
+
+
+def random_baskets(count, max_size=20, alphabet=string.ascii_uppercase,
+                   seed=0):
+    """
+    Generates `count` reproducible random baskets of up to `max_size`
+    SKUs drawn from alphabet
+    """
+    rng = random.Random(seed)
+    return [
+        ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_size)))
+        for _ in range(count)
+    ]
+
+
+def random_basket(size, alphabet=string.ascii_uppercase, seed=0):
+    """
+    Generates one reproducible basket of exactly `size` SKUs. Large
+    baskets repeat a random block of up to 4096 SKUs.
+    """
+    rng = random.Random(seed)
+    block = ''.join(rng.choice(alphabet) for _ in range(min(size, 4096)))
+    repeats = size // len(block) + 1 if block else 0
+    return (block * repeats)[:size]
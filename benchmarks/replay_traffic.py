@@ -0,0 +1,71 @@
+"""
+Replays a runner traffic log straight into the registered solutions.
+
+Logs are written by the runner when tdl_record_traffic is set in
+config/credentials.config (see runner.traffic_log). Every call is made
+as fast as possible, its outcome is checked against the recording, and
+throughput and latency percentiles are reported overall and per method.
+Exits with status 1 if any outcome differs from the recording.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/replay_traffic.py traffic.jsonl
+    PYTHONPATH=lib python benchmarks/replay_traffic.py traffic.jsonl --repeat 5
+    # record a synthetic log of checkout requests first
+    PYTHONPATH=lib python benchmarks/replay_traffic.py traffic.jsonl --generate 10000
+"""
+import argparse
+import sys
+
+from bench_utils import random_baskets
+from runner.latency_stats import format_summary
+from runner.solution_registry import SOLUTIONS, warm_up
+from runner.traffic_log import (
+    TrafficRecorder, read_traffic, record_solutions, replay)
+
+
+def generate(path, count):
+    """
+    Records `count` checkout calls on random baskets to path
+    """
+    recorder = TrafficRecorder(path)
+    try:
+        checkout = dict(record_solutions(SOLUTIONS, recorder))['checkout']
+        for skus in random_baskets(count, max_size=30):
+            checkout(skus)
+    finally:
+        recorder.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('log', help='JSONL traffic log')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='times to replay the whole log')
+    parser.add_argument('--generate', type=int, metavar='COUNT',
+                        help='append COUNT generated checkout calls to the '
+                             'log before replaying it')
+    args = parser.parse_args(argv)
+
+    warm_up([solution for _, solution in SOLUTIONS])
+    if args.generate:
+        generate(args.log, args.generate)
+
+    entries = read_traffic(args.log)
+    summary, mismatches = replay(entries, dict(SOLUTIONS), args.repeat)
+
+    print('all      %s' % format_summary(summary))
+    for method, method_summary in sorted(summary['methods'].items()):
+        print('%-8s %s' % (method, format_summary(method_summary)))
+    for entry, outcome in mismatches[:10]:
+        print('MISMATCH %s(%s): recorded %r, got %r' % (
+            entry['method'], entry['params'],
+            entry.get('result', entry.get('error')), outcome))
+    if mismatches:
+        print('%d of %d calls differ from the recording' % (
+            len(mismatches), summary['requests']))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Benchmark suite for the checkout engine with a stored baseline.
+
+Times checkout, price_counts, evaluate_components, load_prices,
+get_ordered_deals, solve_group_exact and parse_deal_code over a range
+of basket sizes and shapes, compares each case with the baseline and
+exits with status 1 if any case is slower than the baseline by more
+than the threshold. Cases marked cold or varied empty the deal
+component caches first, so they time pricing on a cache miss. Cases that look slower
+are timed again, interleaved with a fixed calibration workload, before
+they count: a case only fails if it is still slower both as measured
+and scaled by how fast the machine runs the calibration compared to
+when the baseline was recorded. A case never fails on a difference
+smaller than the noise floor, so sub-microsecond cases do not fail on
+timer and scheduler noise alone.
+
+Run from the repository root:
+    PYTHONPATH=lib python benchmarks/suite.py               # compare
+    PYTHONPATH=lib python benchmarks/suite.py --update      # new baseline
+    PYTHONPATH=lib python benchmarks/suite.py --threshold 0.5 --filter checkout
+    PYTHONPATH=lib python benchmarks/suite.py --noise-floor 0.2
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from bench_utils import random_baskets
+from solutions.CHK import checkout_solution
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# allowed slowdown against the baseline, as a fraction
+DEFAULT_THRESHOLD = 0.25
+# each timing runs the case enough times to take at least this long
+MIN_TIMING_SECONDS = 0.2
+# timings per case, the best one is kept
+REPEAT = 7
+# slowdowns smaller than this many seconds per call never fail the gate
+NOISE_FLOOR_SECONDS = 1e-6
+
+# every SKU with a deal, in amounts that trigger them
+DEAL_HEAVY = 'AAAAABBEEFFFHHHHHKKNNNMPPPPPQQQRRRUUUUVVV'
+# SKUs without any deal
+DEAL_FREE = 'CDGIJLOSTWXYZ'
+# SKUs that take part in a deal, random baskets are drawn from them
+DEAL_SKUS = 'ABEFHKMNPQRUV'
+# random baskets priced by the varied checkout case
+VARIED_BASKETS = 1000
+BASKET_SIZES = (0, 1, 10, 1000, 1000000)
+# baseline entry of the calibration workload
+CALIBRATION_CASE = 'calibration'
+
+
+def basket(pattern, size):
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+
+def clear_component_caches(catalog):
+    for component in catalog.components:
+        component.clear_cache()
+
+
+def checkout_cases():
+    cases = []
+    for size in BASKET_SIZES:
+        for shape, pattern in (('deal_heavy', DEAL_HEAVY),
+                               ('deal_free', DEAL_FREE)):
+            if not size and shape == 'deal_free':
+                # the empty basket only needs timing once
+                continue
+            skus = basket(pattern, size)
+            cases.append((
+                'checkout/%s/%d' % (shape, size),
+                lambda skus=skus: checkout_solution.checkout(skus),
+            ))
+        if size:
+            skus = basket(DEAL_HEAVY, size - 1) + '-'
+            cases.append((
+                'checkout/invalid/%d' % size,
+                lambda skus=skus: checkout_solution.checkout(skus),
+            ))
+
+    # the cases above price one basket over and over, so deal components
+    # answer from their caches. These price on a cache miss
+    catalog = checkout_solution.get_catalog()
+
+    def cold_checkout(skus):
+        clear_component_caches(catalog)
+        return checkout_solution.checkout(skus)
+
+    for size in (10, 1000):
+        skus = basket(DEAL_HEAVY, size)
+        cases.append((
+            'checkout/cold/deal_heavy/%d' % size,
+            lambda skus=skus: cold_checkout(skus),
+        ))
+
+    def varied_checkout(baskets):
+        clear_component_caches(catalog)
+        for skus in baskets:
+            checkout_solution.checkout(skus)
+
+    baskets = random_baskets(
+        VARIED_BASKETS, max_size=len(DEAL_HEAVY), alphabet=DEAL_SKUS)
+    cases.append((
+        'checkout/varied/%d' % VARIED_BASKETS,
+        lambda: varied_checkout(baskets),
+    ))
+    return cases
+
+
+def component_cases():
+    catalog = checkout_solution.get_catalog()
+    item_prices, item_deals = checkout_solution.load_prices()
+    cases = [
+        ('load_prices', checkout_solution.load_prices),
+        ('get_ordered_deals', lambda: checkout_solution.get_ordered_deals(
+            item_prices, item_deals)),
+        ('parse_deal_code/3A', lambda: checkout_solution.parse_deal_code('3A')),
+        ('parse_deal_code/A', lambda: checkout_solution.parse_deal_code('A')),
+    ]
+    for size in (10, 1000):
+        counts = checkout_solution.count_items(
+            basket(DEAL_HEAVY, size), catalog.sku_index)
+        cases.append((
+            'price_counts/cold/%d' % size,
+            lambda counts=counts: (
+                clear_component_caches(catalog),
+                checkout_solution.price_counts(list(counts), catalog)),
+        ))
+        cases.append((
+            'evaluate_components/cold/%d' % size,
+            lambda counts=counts: (
+                clear_component_caches(catalog),
+                checkout_solution.evaluate_components(
+                    list(counts), catalog.components, catalog.prices)),
+        ))
+    # the exact solver without the component cache in front of it
+    component = catalog.component_of[catalog.sku_index['E']]
+    counts = checkout_solution.count_items(
+        'E' * 100000 + 'B' * 100000, catalog.sku_index)
+    cases.append((
+        'solve_group_exact/100000',
+        lambda: checkout_solution.solve_group_exact(
+            counts, component.skus, component.deals, catalog.prices),
+    ))
+    return cases
+
+
+def calibration():
+    # fixed pure Python work, its speed only depends on the machine
+    total = 0
+    for number in range(1000):
+        total += number * number % 7
+    return total
+
+
+def all_cases():
+    return checkout_cases() + component_cases()
+
+
+def time_case(function, repeat=REPEAT):
+    """
+    Returns best seconds per call to function over `repeat` timings
+    """
+    number = 1
+    while True:
+        elapsed = timeit.timeit(function, number=number)
+        if elapsed >= MIN_TIMING_SECONDS:
+            break
+        number *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, timeit.timeit(function, number=number))
+    return best / number
+
+
+def is_regression(seconds, baseline_seconds, threshold, noise_floor):
+    """
+    Slower than the baseline by more than threshold, as a fraction, and
+    by more than noise_floor seconds
+    """
+    return (
+        seconds > baseline_seconds * (1 + threshold) and
+        seconds - baseline_seconds > noise_floor
+    )
+
+
+def confirm(results, cases, baseline, threshold, noise_floor):
+    """
+    Times cases that look like regressions again, alternating with the
+    calibration workload, and keeps the lower of the best time and the
+    best time scaled to the machine speed of the baseline, so a busy
+    machine cannot fail the gate on its own
+    Returns:
+        (list(tuple)): results with the suspect cases re-timed
+    """
+    calibration_baseline = baseline.get(CALIBRATION_CASE)
+    confirmed = []
+    for name, seconds in results:
+        if name in baseline and is_regression(
+            seconds, baseline[name], threshold, noise_floor
+        ):
+            calibration_seconds = None
+            for _ in range(REPEAT):
+                seconds = min(seconds, time_case(cases[name], 1))
+                if calibration_baseline:
+                    calibration_seconds = min(
+                        calibration_seconds or float('inf'),
+                        time_case(calibration, 1))
+            if calibration_seconds:
+                seconds = min(
+                    seconds,
+                    seconds * calibration_baseline / calibration_seconds)
+        confirmed.append((name, seconds))
+    return confirmed
+
+
+def compare(results, baseline, threshold, noise_floor=NOISE_FLOOR_SECONDS):
+    """
+    Prints each case against the baseline
+    Returns:
+        (list(str)): names of cases slower than baseline beyond threshold
+            and noise_floor
+    """
+    regressions = []
+    print('%-32s %14s %14s %8s' % ('case', 'baseline (us)', 'current (us)', 'ratio'))
+    for name, seconds in results:
+        if name not in baseline:
+            print('%-32s %14s %14.2f %8s' % (name, '-', seconds * 1e6, 'new'))
+            continue
+        ratio = seconds / baseline[name]
+        flag = ''
+        if is_regression(seconds, baseline[name], threshold, noise_floor):
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-32s %14.2f %14.2f %7.2fx%s' % (
+            name, baseline[name] * 1e6, seconds * 1e6, ratio, flag))
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='baseline JSON file')
+    parser.add_argument('--update', action='store_true',
+                        help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown as a fraction (default 0.25)')
+    parser.add_argument('--filter', default='',
+                        help='only run cases whose name contains this')
+    parser.add_argument('--noise-floor', type=float,
+                        default=NOISE_FLOOR_SECONDS * 1e6,
+                        help='slowdowns of fewer microseconds per call '
+                             'never fail (default %.1f)' % (
+                                 NOISE_FLOOR_SECONDS * 1e6))
+    args = parser.parse_args(argv)
+    noise_floor = args.noise_floor / 1e6
+
+    cases = [
+        (name, function)
+        for name, function in all_cases() if args.filter in name
+    ]
+    results = [(name, time_case(function)) for name, function in cases]
+
+    baseline = load_baseline(args.baseline)
+    if args.update:
+        baseline.update(results)
+        baseline[CALIBRATION_CASE] = time_case(calibration)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print('Wrote %d cases to %s' % (len(results), args.baseline))
+        return 0
+
+    results = confirm(results, dict(cases), baseline, args.threshold, noise_floor)
+    regressions = compare(results, baseline, args.threshold, noise_floor)
+    if regressions:
+        print('%d case(s) regressed by more than %d%%: %s' % (
+            len(regressions), args.threshold * 100, ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
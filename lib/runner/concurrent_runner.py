@@ -0,0 +1,432 @@
+"""
+Concurrent request dispatch for the queue based runner.
+
+A drop-in alternative to tdl's QueueBasedImplementationRunner that
+hands each request to a pool of workers instead of running it on the
+connection's listener thread, so one slow request no longer holds up
+the ones behind it. At most `max_in_flight` requests are taken from
+the broker at a time, and responses are acknowledged and published in
+the order the requests arrived, exactly as the serial runner does.
+
+A request whose solution cannot be run at all (it or its result cannot
+be pickled, or its worker died) or does not finish within the solution
+timeout is answered with a FatalErrorResponse, like a solution that
+raised, so the window never stays full.
+"""
+import datetime
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+from runner.latency_stats import clock
+from runner.solution_registry import warm_up
+from tdl.queue.abstractions.response.fatal_error_response import \
+    FatalErrorResponse
+from tdl.queue.abstractions.response.valid_response import ValidResponse
+from tdl.queue.queue_based_implementation_runner import \
+    QueueBasedImplementationRunnerAudit
+from tdl.queue.transport.listener import Listener
+from tdl.queue.transport.remote_broker import RemoteBroker
+
+
+# seconds a solution may run before its request fails
+SOLUTION_TIMEOUT = 60.0
+# seconds between checks for requests that failed outside call_solution
+WATCHDOG_INTERVAL = 0.05
+
+
+def display_description(*_):
+    return 'OK'
+
+
+def call_solution(implementation, params):
+    """
+    Runs a solution in a worker
+    Returns:
+        (bool): whether the solution returned normally
+        result of the solution, or the exception message
+        (float): seconds the solution took
+    """
+    start = clock()
+    try:
+        return True, implementation(*params), clock() - start
+    except Exception as e:
+        return False, str(e), clock() - start
+
+
+class WindowedRemoteBroker(RemoteBroker):
+    """
+    RemoteBroker that subscribes with a prefetch window and only runs
+    its idle timer while no request is being worked on
+    """
+
+    def __init__(self, hostname, port, request_queue_name,
+                 response_queue_name, request_timeout_millis, max_in_flight):
+        RemoteBroker.__init__(
+            self, hostname, port, request_queue_name, response_queue_name,
+            request_timeout_millis)
+        self.max_in_flight = max_in_flight
+        self._timer_lock = threading.Lock()
+        self._busy = False
+
+    def subscribe(self, handling_strategy, audit):
+        listener = Listener(
+            self, handling_strategy, self.start_timer, self.stop_timer, audit)
+        self.conn.set_listener('listener', listener)
+        self.conn.subscribe(
+            destination=self.request_queue_name,
+            id=1,
+            ack='client-individual',
+            headers={'activemq.prefetchSize': self.max_in_flight},
+        )
+        self.start_timer()
+
+    def set_busy(self, busy):
+        """
+        Stops the idle timer while requests are in flight and restarts
+        it once they are all answered
+        """
+        with self._timer_lock:
+            self._busy = busy
+        if busy:
+            self.stop_timer()
+        else:
+            self.start_timer()
+
+    def start_timer(self):
+        with self._timer_lock:
+            # never leave an earlier timer running, it would disconnect
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._busy:
+                self._timer = threading.Timer(
+                    self.request_timeout_millis / 1000.00, self.close)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def stop_timer(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class OrderedDispatch(object):
+    """
+    Handling strategy running requests on a worker pool and publishing
+    their responses in the order the requests were received
+    """
+
+    def __init__(self, solutions, pool, max_in_flight, audit, recorder=None,
+                 timeout=SOLUTION_TIMEOUT):
+        """
+        Args:
+            solutions (dict): {method name: implementation}
+            pool (multiprocessing.pool.Pool): workers to run solutions on
+            max_in_flight (int): requests taken before one is answered
+            audit (QueueBasedImplementationRunnerAudit): request log
+            recorder (runner.traffic_log.TrafficRecorder): records every
+                solution call when given
+            timeout (float): seconds a solution may run before its
+                request fails, None to wait for ever
+        """
+        self._solutions = solutions
+        self._recorder = recorder
+        self._pool = pool
+        self._audit = audit
+        self._timeout = timeout
+        self._window = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        # held while responses are published so they go out in order
+        self._publish_lock = threading.Lock()
+        self._next_sequence = 0
+        self._next_to_publish = 0
+        # {sequence: (headers, request, response)} waiting to publish
+        self._completed = {}
+        # {sequence: [AsyncResult, deadline, broker, headers, request]}
+        # handed to the pool and not completed yet
+        self._running = {}
+        self._in_flight = 0
+        self._stopped = False
+        self._closed = threading.Event()
+        self._watchdog = None
+
+    def process_next_request_from(self, remote_broker, headers, request):
+        # blocks the listener, and so the broker, while the window is full
+        self._window.acquire()
+        with self._lock:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            self._in_flight += 1
+            if self._in_flight == 1:
+                remote_broker.set_busy(True)
+
+        implementation = self._solutions.get(request.method)
+        if implementation is None:
+            self._complete(
+                remote_broker, sequence, headers, request,
+                FatalErrorResponse(
+                    "method '{0}' did not match any processing rule".format(
+                        request.method)))
+            return None
+
+        def on_result(outcome):
+            succeeded, result, elapsed = outcome
+            if self._recorder is not None:
+                self._recorder.record(
+                    request.method, request.params,
+                    result if succeeded else None, elapsed,
+                    None if succeeded else result, request.id)
+            if succeeded:
+                response = ValidResponse(request.id, result)
+            else:
+                print(result)
+                response = FatalErrorResponse(
+                    'user implementation raised exception')
+            self._complete(remote_broker, sequence, headers, request, response)
+
+        deadline = None
+        if self._timeout is not None:
+            deadline = clock() + self._timeout
+        running = [None, deadline, remote_broker, headers, request]
+        with self._lock:
+            self._running[sequence] = running
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(
+                    target=self._watch, name='dispatch-watchdog')
+                self._watchdog.daemon = True
+                self._watchdog.start()
+        # python 2.7 has no error_callback, the watchdog picks up
+        # results that fail without calling on_result
+        running[0] = self._pool.apply_async(
+            call_solution, (implementation, request.params),
+            callback=on_result)
+        return None
+
+    def close(self):
+        """
+        Stops the watchdog thread
+        """
+        self._closed.set()
+        watchdog = self._watchdog
+        if watchdog is not None:
+            watchdog.join()
+
+    def _watch(self):
+        """
+        Fails requests whose pooled call failed outside call_solution,
+        so on_result never ran, or that ran past their deadline
+        """
+        while not self._closed.wait(WATCHDOG_INTERVAL):
+            now = clock()
+            with self._lock:
+                running = list(self._running.items())
+            for sequence, (async_result, deadline, remote_broker, headers,
+                           request) in running:
+                if async_result is None:
+                    continue
+                if async_result.ready():
+                    if async_result.successful():
+                        continue
+                    try:
+                        async_result.get(0)
+                    except Exception as e:
+                        print(e)
+                    message = 'user implementation raised exception'
+                elif deadline is not None and now >= deadline:
+                    message = 'user implementation did not respond ' \
+                              'within {0}s'.format(self._timeout)
+                    print(message)
+                else:
+                    continue
+                self._complete(
+                    remote_broker, sequence, headers, request,
+                    FatalErrorResponse(message))
+
+    def _complete(self, remote_broker, sequence, headers, request, response):
+        with self._publish_lock:
+            with self._lock:
+                if (
+                    sequence < self._next_to_publish or
+                    sequence in self._completed
+                ):
+                    # already answered, by on_result or the watchdog
+                    return
+                self._running.pop(sequence, None)
+                self._completed[sequence] = (headers, request, response)
+                ready = []
+                while self._next_to_publish in self._completed:
+                    ready.append(self._completed.pop(self._next_to_publish))
+                    self._next_to_publish += 1
+
+            for completed in ready:
+                self._publish(remote_broker, *completed)
+
+        with self._lock:
+            self._in_flight -= len(ready)
+            if ready and not self._in_flight:
+                remote_broker.set_busy(False)
+        for _ in ready:
+            self._window.release()
+
+    def _publish(self, remote_broker, headers, request, response):
+        """
+        Logs and publishes one response the way tdl's
+        ApplyProcessingRules does. After a fatal error nothing else is
+        published.
+        """
+        if self._stopped:
+            return
+        self._audit.start_line()
+        self._audit.log(request)
+        self._audit.log(response)
+        if isinstance(response, FatalErrorResponse):
+            self._stopped = True
+            remote_broker.stop()
+        else:
+            remote_broker.respond_to(headers, response)
+        self._audit.end_line()
+
+
+class ConcurrentImplementationRunner(object):
+    """
+    Runner answering requests from a pool of workers
+    """
+
+    def __init__(self, config, solutions, workers, max_in_flight, processes,
+                 recorder=None, solution_timeout=SOLUTION_TIMEOUT):
+        self._config = config
+        self._solutions = solutions
+        self._workers = workers
+        self._max_in_flight = max_in_flight
+        self._processes = processes
+        self._recorder = recorder
+        self._solution_timeout = solution_timeout
+        self._audit = QueueBasedImplementationRunnerAudit(
+            config.get_audit_stream())
+        self.total_processing_time_millis = None
+
+    def run(self):
+        start_time = datetime.datetime.now()
+        # load lazy solutions first so forked workers start with them
+        warm_up(self._solutions.values())
+        pool_class = multiprocessing.Pool if self._processes else ThreadPool
+        pool = pool_class(self._workers)
+        dispatch = OrderedDispatch(
+            self._solutions, pool, self._max_in_flight, self._audit,
+            self._recorder, self._solution_timeout)
+
+        try:
+            self._audit.log_line('Starting client')
+
+            remote_broker = WindowedRemoteBroker(
+                self._config.get_hostname(),
+                self._config.get_port(),
+                self._config.get_request_queue_name(),
+                self._config.get_response_queue_name(),
+                self._config.get_time_to_wait_for_request(),
+                self._max_in_flight)
+
+            self._audit.log_line('Waiting for requests')
+
+            remote_broker.subscribe(dispatch, self._audit)
+
+            while remote_broker.is_connected():
+                time.sleep(0.1)
+
+            self._audit.log_line('Stopping client')
+        except Exception as e:
+            self._audit.log_exception(
+                'There was a problem processing messages', e)
+        finally:
+            dispatch.close()
+            # anything still running was abandoned with the connection,
+            # and a task lost with its worker would block close()
+            pool.terminate()
+            pool.join()
+
+        end_time = datetime.datetime.now()
+        self.total_processing_time_millis = \
+            (end_time - start_time).total_seconds() * 1000.00
+
+    def get_request_timeout_millis(self):
+        return self._config.get_time_to_wait_for_request()
+
+
+class ConcurrentImplementationRunnerBuilder(object):
+    """
+    Same interface as tdl's QueueBasedImplementationRunnerBuilder, plus
+    the size of the worker pool and of the in-flight window
+    """
+
+    def __init__(self):
+        self._config = None
+        self._solutions = {'display_description': display_description}
+        self._workers = multiprocessing.cpu_count()
+        self._max_in_flight = None
+        self._processes = True
+        self._recorder = None
+        self._solution_timeout = SOLUTION_TIMEOUT
+
+    def set_config(self, config):
+        self._config = config
+        return self
+
+    def with_solution_for(self, method_name, user_implementation):
+        self._solutions[method_name] = user_implementation
+        return self
+
+    def with_workers(self, workers, processes=True):
+        """
+        Args:
+            workers (int): size of the worker pool
+            processes (bool): run solutions in worker processes, which
+                lets CPU bound solutions use every core. Solutions then
+                have to be module level functions so they can be pickled.
+                With False they run on threads.
+        """
+        self._workers = workers
+        self._processes = processes
+        return self
+
+    def with_max_in_flight(self, max_in_flight):
+        """
+        Args:
+            max_in_flight (int): requests taken from the broker before the
+                oldest is answered, defaults to twice the worker count
+        """
+        self._max_in_flight = max_in_flight
+        return self
+
+    def with_recorder(self, recorder):
+        """
+        Args:
+            recorder (runner.traffic_log.TrafficRecorder): records every
+                request and its result, from this process whichever
+                worker ran it
+        """
+        self._recorder = recorder
+        return self
+
+    def with_solution_timeout(self, solution_timeout):
+        """
+        Args:
+            solution_timeout (float): seconds a solution may run before
+                its request is answered with a fatal error, like one that
+                raised, None to wait for ever
+        """
+        self._solution_timeout = solution_timeout
+        return self
+
+    def create(self):
+        return ConcurrentImplementationRunner(
+            self._config,
+            dict(self._solutions),
+            self._workers,
+            self._max_in_flight or 2 * self._workers,
+            self._processes,
+            self._recorder,
+            self._solution_timeout,
+        )
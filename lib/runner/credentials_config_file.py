@@ -1,43 +1,197 @@
 import os
+import threading
+import time
+
+
+CONFIG_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "..", "config", "credentials.config")
+
+_MISSING = object()
+
+# values get_bool accepts, compared in lower case
+_TRUE_VALUES = ('true', 'yes', '1')
+_FALSE_VALUES = ('false', 'no', '0')
 
 
 def read_from_config_file(key):
-    properties = read_properties_file()
-    return properties[key]
+    return get_credentials_config().get(key)
 
 
 def read_from_config_file_with_default(key, default_value):
-    properties = read_properties_file()
-    return properties.get(key, default_value)
+    return get_credentials_config().get(key, default_value)
+
+
+class CredentialsConfig(object):
+    """
+    Properties from credentials.config, parsed on first use and kept.
+
+    A key can be overridden by an environment variable with the key's
+    name in upper case, eg. TDL_HOSTNAME for tdl_hostname. With a
+    reload_interval the file is checked for changes at most once every
+    reload_interval seconds and parsed again when it has changed.
+    """
+
+    def __init__(self, path=CONFIG_FILE, environ=None, reload_interval=None):
+        """
+        Args:
+            path (str): location of the properties file
+            environ (dict): environment to take overrides from, defaults
+                to os.environ
+            reload_interval (float): seconds between checks of the file
+                for changes, None to never reload
+        """
+        self.path = path
+        self.environ = os.environ if environ is None else environ
+        self.reload_interval = reload_interval
+        self._properties = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def properties(self):
+        """
+        Returns the parsed properties file, {key: value}
+        """
+        properties = self._properties
+        if properties is None:
+            return self.reload()
+        if self.reload_interval is not None:
+            now = time.time()
+            if now - self._checked_at >= self.reload_interval:
+                self._checked_at = now
+                if _file_version(self.path) != self._version:
+                    return self.reload()
+        return properties
+
+    def reload(self):
+        """
+        Parses the properties file again. If it cannot be read once
+        properties have been loaded, the error is printed and the loaded
+        properties stay in use.
+        Returns:
+            (dict): {key: value}
+        """
+        with self._lock:
+            self._version = _file_version(self.path)
+            self._checked_at = time.time()
+            if self._properties is None:
+                self._properties = load_properties(self.path)
+            else:
+                try:
+                    self._properties = parse_properties(self.path)
+                except IOError as e:
+                    print('ERROR: could not reload %s, keeping the '
+                          'properties already loaded: %s' % (self.path, e))
+            return self._properties
+
+    def get(self, key, default=_MISSING):
+        """
+        Returns the value of key, from the environment if it is set
+        there
+        Raises:
+            KeyError: key is not set and there is no default
+        """
+        override = self.environ.get(key.upper())
+        if override is not None:
+            return parse_value(override)
+        value = self.properties().get(key, default)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get_str(self, key, default=_MISSING):
+        value = self.get(key, default)
+        return value if value is default else str(value)
+
+    def get_bool(self, key, default=_MISSING):
+        """
+        Returns key as a bool. true, yes and 1 are True, false, no and 0
+        are False, in any case.
+        Raises:
+            ValueError: the value is none of those
+        """
+        value = self.get(key, default)
+        if value is default or isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE_VALUES:
+            return True
+        if text in _FALSE_VALUES:
+            return False
+        raise ValueError('%s must be true or false, not %r' % (key, value))
+
+    def get_int(self, key, default=_MISSING):
+        value = self.get(key, default)
+        return value if value is default else int(value)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_credentials_config():
+    """
+    Returns the process-wide CredentialsConfig of config/credentials.config
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = CredentialsConfig()
+    return _config
 
 
 # ~~~~ Helpers
 
 
 def read_properties_file():
-    current_dir = os.path.dirname(__file__)
-    properties = load_properties(os.path.join(current_dir, "..", "..", "config", "credentials.config"))
-    return properties
+    return get_credentials_config().properties()
 
 
-def load_properties(filepath, sep='=', comment_char='#'):
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size, stat.st_ino
+
+
+def parse_value(value, sep='='):
+    """
+    Converts a raw property value, removing quotes and escapes and
+    turning true and false into bools
+    """
+    value = value.strip().strip('"')
+    value = value.replace("\\" + sep, sep)
+    if value in ['true', 'false']:
+        value = value == 'true'
+    return value
+
+
+def parse_properties(filepath, sep='=', comment_char='#'):
     """
     Read the file passed as parameter as a properties file.
+    Raises:
+        IOError: the file cannot be read
     """
     props = {}
+    with open(filepath, "rt") as f:
+        for line in f:
+            l = line.strip()
+            if l and not l.startswith(comment_char):
+                key_value = l.split(sep)
+                key = key_value[0].strip()
+                props[key] = parse_value(sep.join(key_value[1:]), sep)
+    return props
+
+
+def load_properties(filepath, sep='=', comment_char='#'):
+    """
+    Read the file passed as parameter as a properties file, exiting
+    if it is not there.
+    """
     try:
-        with open(filepath, "rt") as f:
-            for line in f:
-                l = line.strip()
-                if l and not l.startswith(comment_char):
-                    key_value = l.split(sep)
-                    key = key_value[0].strip()
-                    value = sep.join(key_value[1:]).strip().strip('"')
-                    value = value.replace("\=", "=")
-                    if value in ['true', 'false']:
-                        value = value == 'true'
-                    props[key] = value
-        return props
+        return parse_properties(filepath, sep, comment_char)
     except IOError as e:
         print('ERROR: You need to download the credentials.config file before you can run this.')
         exit(1)
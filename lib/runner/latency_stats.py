@@ -0,0 +1,62 @@
+"""
+Throughput and latency percentiles for runner performance reports.
+"""
+import math
+import time
+
+# percentiles included in every summary
+PERCENTILES = (50, 90, 99, 99.9)
+
+# monotonic high resolution timer where available, for timing requests
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile
+    Args:
+        sorted_values (list(float)): values in ascending order
+        percent (float): 0 to 100
+    Returns:
+        (float): value below which `percent` of values fall, None when
+            there are no values
+    """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def summarise(latencies, elapsed):
+    """
+    Args:
+        latencies (list(float)): seconds taken by each request
+        elapsed (float): wall clock seconds for all requests
+    Returns:
+        (dict): requests, requests_per_second, and latency in
+            milliseconds for each of PERCENTILES plus max
+    """
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'max_ms': latencies[-1] * 1e3 if latencies else None,
+    }
+    for percent in PERCENTILES:
+        value = percentile(latencies, percent)
+        summary['p%s_ms' % percent] = value * 1e3 if value is not None else None
+    return summary
+
+
+def format_summary(summary):
+    """
+    Returns a summary from summarise as one line of text
+    """
+    latencies = ', '.join(
+        'p%s %.3fms' % (percent, summary['p%s_ms' % percent])
+        for percent in PERCENTILES if summary['p%s_ms' % percent] is not None)
+    if summary['max_ms'] is not None:
+        latencies += ', max %.3fms' % summary['max_ms']
+    return '%d requests, %.0f requests/s%s' % (
+        summary['requests'], summary['requests_per_second'],
+        ' (%s)' % latencies if latencies else '')
@@ -0,0 +1,425 @@
+"""
+Local stand-in for the challenge server's message broker.
+
+LocalBroker listens on a localhost socket and speaks the part of STOMP
+the runner's stomp.py connection uses: CONNECT/STOMP, SUBSCRIBE,
+UNSUBSCRIBE, SEND, ACK and DISCONNECT. Messages sent to a queue are
+delivered to its subscriber, at most `prefetch` unacknowledged at a
+time, and messages sent to a queue nobody subscribes to are kept so
+they can be read back. Delivery and arrival times are recorded, so a
+runner pointed at the broker can be timed end to end without the
+challenge server.
+"""
+from collections import deque, namedtuple
+import socket
+import threading
+
+from runner.latency_stats import clock
+
+try:
+    import socketserver
+except ImportError:
+    # python 2
+    import SocketServer as socketserver
+
+
+# linux only, switched back off by the kernel so it is set after reads
+_TCP_QUICKACK = getattr(socket, 'TCP_QUICKACK', None)
+
+# message held by the broker, enqueued_at is a clock() time
+Message = namedtuple('Message', ['message_id', 'destination', 'body',
+                                 'enqueued_at'])
+
+# STOMP 1.1 header escapes, backslash first when escaping
+_ESCAPES = (('\\', '\\\\'), ('\n', '\\n'), (':', '\\c'))
+
+
+def _escape(value):
+    for character, escaped in _ESCAPES:
+        value = value.replace(character, escaped)
+    return value
+
+
+def _unescape(value):
+    for character, escaped in reversed(_ESCAPES):
+        value = value.replace(escaped, character)
+    return value
+
+
+def encode_frame(command, headers, body=b''):
+    """
+    Serialises a STOMP frame
+    Args:
+        command (str): eg. MESSAGE
+        headers (dict): {name: value}
+        body (bytes): frame body
+    Returns:
+        (bytes)
+    """
+    escape = _escape if command != 'CONNECTED' else (lambda value: value)
+    lines = [command] + [
+        '%s:%s' % (escape(name), escape(str(value)))
+        for name, value in sorted(headers.items())
+    ]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8') + body + b'\x00'
+
+
+def decode_frames(buffer):
+    """
+    Splits complete STOMP frames off the front of buffer
+    Args:
+        buffer (bytes): data read from the socket so far
+    Returns:
+        (list(tuple)): (command, headers, body) of each complete frame
+        (bytes): what is left of buffer
+    """
+    frames = []
+    while True:
+        # heart-beats are bare end of lines between frames
+        buffer = buffer.lstrip(b'\r\n')
+        header_end = buffer.find(b'\n\n')
+        if header_end < 0:
+            return frames, buffer
+
+        lines = buffer[:header_end].decode('utf-8').split('\n')
+        command = lines[0].rstrip('\r')
+        unescape = _unescape if command not in ('CONNECT', 'STOMP') else (
+            lambda value: value)
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.rstrip('\r').partition(':')
+            # the first occurrence of a repeated header wins
+            headers.setdefault(unescape(name), unescape(value))
+
+        body_start = header_end + 2
+        if 'content-length' in headers:
+            body_end = body_start + int(headers['content-length'])
+            # the body is followed by a NULL octet
+            if len(buffer) <= body_end:
+                return frames, buffer
+        else:
+            body_end = buffer.find(b'\x00', body_start)
+            if body_end < 0:
+                return frames, buffer
+
+        frames.append((command, headers, buffer[body_start:body_end]))
+        buffer = buffer[body_end + 1:]
+
+
+class _Subscription(object):
+    def __init__(self, connection, subscription_id, destination, ack,
+                 prefetch):
+        self.connection = connection
+        self.id = subscription_id
+        self.destination = destination
+        self.auto_ack = ack == 'auto'
+        self.prefetch = prefetch
+        # {message_id: Message} delivered and not acknowledged yet
+        self.unacked = {}
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """
+    One client connection, reading frames until it disconnects
+    """
+
+    def setup(self):
+        self.broker = self.server.broker
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._write_lock = threading.Lock()
+        # (command, headers, body) of frames waiting to be sent, in order
+        self._outbox = deque()
+        self.connected = True
+
+    def queue(self, command, headers, body=b''):
+        """
+        Adds a frame to send with the next flush, cheap enough to call
+        with the broker lock held
+        """
+        self._outbox.append((command, headers, body))
+
+    def flush(self):
+        """
+        Sends queued frames in the order they were queued. Only blocks
+        on this client's socket, never the broker lock.
+        """
+        with self._write_lock:
+            while self._outbox:
+                frame = encode_frame(*self._outbox.popleft())
+                if not self.connected:
+                    continue
+                try:
+                    self.request.sendall(frame)
+                except EnvironmentError:
+                    # gone without a DISCONNECT, handle() sees it next
+                    self.connected = False
+
+    def write(self, command, headers, body=b''):
+        self.queue(command, headers, body)
+        self.flush()
+
+    def handle(self):
+        buffer = b''
+        while self.connected:
+            data = self.request.recv(65536)
+            if _TCP_QUICKACK is not None:
+                # the client writes ACK and the response as two frames,
+                # a delayed TCP ack of the first holds the second back
+                self.request.setsockopt(
+                    socket.IPPROTO_TCP, _TCP_QUICKACK, 1)
+            if not data:
+                break
+            frames, buffer = decode_frames(buffer + data)
+            for command, headers, body in frames:
+                self.broker.handle_frame(self, command, headers, body)
+
+    def finish(self):
+        self.connected = False
+        self.broker.connection_closed(self)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalBroker(object):
+    """
+    Localhost STOMP broker with one consumer per queue
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, prefetch=1):
+        """
+        Args:
+            host (str): interface to listen on
+            port (int): port to listen on, 0 picks a free one
+            prefetch (int): most unacknowledged messages a subscriber is
+                sent at once, unless its SUBSCRIBE frame asks for another
+                number with activemq.prefetchSize
+        """
+        self.host = host
+        self.port = port
+        self.prefetch = prefetch
+        self._lock = threading.Lock()
+        # notified whenever a client sends a message
+        self._sent = threading.Condition(self._lock)
+        self._queues = {}
+        # {destination: [_Subscription]}
+        self._subscriptions = {}
+        self._next_message_id = 0
+        # connections _dispatch queued frames for, flushed by _flush
+        self._unflushed = set()
+        # {message_id: clock() time the message was sent to a subscriber}
+        self.delivered_at = {}
+        self.frames_received = 0
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts listening in a daemon thread
+        Returns:
+            (int): port the broker listens on
+        """
+        self._server = _Server((self.host, self.port), _ConnectionHandler)
+        self._server.broker = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='local-broker')
+        self._thread.daemon = True
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        """
+        Stops listening, open connections are left to their clients
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def enqueue(self, destination, body):
+        """
+        Adds a message to a queue, delivering it if there is room in
+        the subscriber's prefetch window
+        Args:
+            destination (str): queue name
+            body (str or bytes): message body
+        Returns:
+            (str): message-id of the message
+        """
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        with self._lock:
+            message = self._new_message(destination, body)
+            self._queues.setdefault(destination, deque()).append(message)
+            self._dispatch(destination)
+            self._sent.notify_all()
+        self._flush()
+        return message.message_id
+
+    def messages(self, destination):
+        """
+        Returns messages waiting in a queue without a subscriber, oldest
+        first, and removes them from the queue
+        Returns:
+            (list(Message))
+        """
+        with self._lock:
+            queue = self._queues.pop(destination, deque())
+        return list(queue)
+
+    def wait_for_messages(self, destination, count, timeout=None):
+        """
+        Waits until a queue without a subscriber holds `count` messages
+        Returns:
+            (bool): False if timeout seconds passed first
+        """
+        deadline = None if timeout is None else clock() + timeout
+        with self._lock:
+            while len(self._queues.get(destination, ())) < count:
+                remaining = None if deadline is None else deadline - clock()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._sent.wait(remaining)
+        return True
+
+    def pending(self, destination):
+        """
+        Returns number of messages in a queue, including ones delivered
+        but not acknowledged yet
+        """
+        with self._lock:
+            unacked = sum(
+                len(subscription.unacked)
+                for subscription in self._subscriptions.get(destination, []))
+            return len(self._queues.get(destination, ())) + unacked
+
+    def _new_message(self, destination, body):
+        self._next_message_id += 1
+        return Message(
+            str(self._next_message_id), destination, body, clock())
+
+    def _dispatch(self, destination):
+        """
+        Queues messages for subscribers with room in their prefetch
+        window. Called with the lock held, so each subscriber gets its
+        messages in queue order. They are sent by _flush once the lock
+        is released, so a slow subscriber holds up no one else.
+        """
+        queue = self._queues.get(destination)
+        for subscription in self._subscriptions.get(destination, []):
+            while queue and len(subscription.unacked) < subscription.prefetch:
+                message = queue.popleft()
+                if not subscription.auto_ack:
+                    subscription.unacked[message.message_id] = message
+                self.delivered_at[message.message_id] = clock()
+                subscription.connection.queue('MESSAGE', {
+                    'destination': message.destination,
+                    'message-id': message.message_id,
+                    'subscription': subscription.id,
+                    'content-length': len(message.body),
+                }, message.body)
+                self._unflushed.add(subscription.connection)
+
+    def _flush(self):
+        """
+        Sends the frames _dispatch queued, called without the lock
+        """
+        with self._lock:
+            connections, self._unflushed = self._unflushed, set()
+        for connection in connections:
+            connection.flush()
+
+    def handle_frame(self, connection, command, headers, body):
+        """
+        Applies one frame received from a client
+        """
+        self.frames_received += 1
+        if command in ('CONNECT', 'STOMP'):
+            accepted = headers.get('accept-version', '1.0').split(',')
+            connection.write('CONNECTED', {
+                'version': '1.1' if '1.1' in accepted else '1.0',
+                'heart-beat': '0,0',
+                'server': 'local-broker',
+            })
+        elif command == 'SEND':
+            with self._lock:
+                message = self._new_message(headers['destination'], body)
+                self._queues.setdefault(
+                    message.destination, deque()).append(message)
+                self._dispatch(message.destination)
+                self._sent.notify_all()
+        elif command == 'SUBSCRIBE':
+            subscription = _Subscription(
+                connection, headers.get('id', headers['destination']),
+                headers['destination'], headers.get('ack', 'auto'),
+                int(headers.get('activemq.prefetchSize', self.prefetch)))
+            with self._lock:
+                self._subscriptions.setdefault(
+                    subscription.destination, []).append(subscription)
+                self._dispatch(subscription.destination)
+        elif command == 'UNSUBSCRIBE':
+            with self._lock:
+                self._unsubscribe(
+                    lambda subscription: subscription.connection is connection
+                    and subscription.id == headers.get('id'))
+        elif command == 'ACK':
+            message_id = headers.get('message-id', headers.get('id'))
+            with self._lock:
+                self._acknowledge(
+                    connection, headers.get('subscription'), message_id)
+        elif command == 'DISCONNECT':
+            if 'receipt' in headers:
+                connection.write('RECEIPT', {'receipt-id': headers['receipt']})
+            connection.connected = False
+        else:
+            connection.write('ERROR', {'message': 'unsupported %s' % command})
+
+        self._flush()
+        if 'receipt' in headers and command != 'DISCONNECT':
+            connection.write('RECEIPT', {'receipt-id': headers['receipt']})
+
+    def _acknowledge(self, connection, subscription_id, message_id):
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                if (
+                    subscription.connection is connection and
+                    (subscription_id is None or
+                     subscription.id == subscription_id) and
+                    subscription.unacked.pop(message_id, None) is not None
+                ):
+                    self._dispatch(subscription.destination)
+                    return
+
+    def _unsubscribe(self, matches):
+        """
+        Removes matching subscriptions, putting their unacknowledged
+        messages back at the front of the queue. Called with the lock held
+        """
+        destinations = set()
+        for destination, subscriptions in self._subscriptions.items():
+            for subscription in [s for s in subscriptions if matches(s)]:
+                subscriptions.remove(subscription)
+                queue = self._queues.setdefault(destination, deque())
+                queue.extendleft(sorted(
+                    subscription.unacked.values(),
+                    key=lambda message: -int(message.message_id)))
+                destinations.add(destination)
+
+        for destination in destinations:
+            self._dispatch(destination)
+
+    def connection_closed(self, connection):
+        with self._lock:
+            self._unsubscribe(
+                lambda subscription: subscription.connection is connection)
+        self._flush()
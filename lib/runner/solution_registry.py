@@ -0,0 +1,136 @@
+"""
+Solutions registered by module path and imported when first needed.
+
+A LazySolution stands in for a solution function anywhere the runners
+expect one. The module is imported on the first request, or earlier
+by warm_up, which can run in the background while the tdl client
+starts and connects.
+
+Loaded solutions are kept per process, by path, so copies of a
+LazySolution unpickled in pool workers import and warm up only once.
+"""
+import importlib
+import threading
+
+# path -> solution function loaded in this process
+_loaded = {}
+# path -> lock held while that solution loads
+_loading = {}
+_loading_lock = threading.Lock()
+
+
+def import_function(path):
+    """
+    Args:
+        path (str): 'package.module:function'
+    Returns:
+        (function)
+    """
+    module_name, _, function_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def load_solution(path, warm_up=None):
+    """
+    Imports a solution and runs its warm-up, once per process
+    Args:
+        path (str): 'package.module:function' of the solution
+        warm_up (str): 'package.module:function' called after the import
+    Returns:
+        (function): the solution
+    """
+    function = _loaded.get(path)
+    if function is not None:
+        return function
+    with _loading_lock:
+        lock = _loading.setdefault(path, threading.Lock())
+    with lock:
+        function = _loaded.get(path)
+        if function is None:
+            function = import_function(path)
+            if warm_up is not None:
+                import_function(warm_up)()
+            _loaded[path] = function
+    return function
+
+
+class LazySolution(object):
+    """
+    Callable importing a solution function on first use
+    """
+
+    def __init__(self, path, warm_up=None):
+        """
+        Args:
+            path (str): 'package.module:function' of the solution
+            warm_up (str): 'package.module:function' called once after
+                the solution is imported, eg. to compile data it needs
+        """
+        self.path = path
+        self.warm_up = warm_up
+        self._function = None
+
+    def load(self):
+        """
+        Imports the solution and runs its warm-up, once per process
+        Returns:
+            (function): the solution
+        """
+        if self._function is None:
+            self._function = load_solution(self.path, self.warm_up)
+        return self._function
+
+    def __call__(self, *args):
+        function = self._function
+        if function is None:
+            function = self.load()
+        return function(*args)
+
+    def __reduce__(self):
+        # worker processes load the solution themselves, once each
+        return LazySolution, (self.path, self.warm_up)
+
+    def __repr__(self):
+        return 'LazySolution(%r)' % self.path
+
+
+def warm_up(solutions, background=False):
+    """
+    Loads every LazySolution in solutions, other callables are skipped
+    Args:
+        solutions (iterable): solution functions
+        background (bool): load them on a daemon thread and return at
+            once. A request arriving first waits for its own solution
+            only.
+    Returns:
+        (threading.Thread): the warm-up thread when in background
+    """
+    lazy_solutions = [
+        solution for solution in solutions
+        if isinstance(solution, LazySolution)
+    ]
+
+    def load_all():
+        for solution in lazy_solutions:
+            solution.load()
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name='solution-warm-up')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+# (method name, solution) of each request the challenge server sends
+SOLUTIONS = (
+    ('sum', LazySolution('solutions.SUM.sum_solution:compute')),
+    ('hello', LazySolution('solutions.HLO.hello_solution:hello')),
+    ('fizz_buzz', LazySolution('solutions.FIZ.fizz_buzz_solution:fizz_buzz')),
+    # prices.csv is compiled up front and then reloaded by a background
+    # watcher when it changes, so requests never pay for a recompile
+    ('checkout', LazySolution(
+        'solutions.CHK.checkout_solution:checkout',
+        warm_up='solutions.CHK.checkout_solution:start_catalog_watcher')),
+)
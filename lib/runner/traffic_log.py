@@ -0,0 +1,163 @@
+"""
+Recording runner traffic to a JSONL log and replaying it.
+
+Each line of a log is one solution call:
+    {"method":"checkout","params":["AAB"],"result":130,"ms":0.021}
+with "error" instead of "result" when the solution raised, and "id"
+when the request id is known. replay feeds a log straight into
+solution functions, without a broker, checking every result against
+the recorded one.
+"""
+import json
+import threading
+
+from runner.latency_stats import clock, summarise
+
+
+def _dumps(entry):
+    return json.dumps(entry, separators=(',', ':'), sort_keys=True)
+
+
+class TrafficRecorder(object):
+    """
+    Appends solution calls to a JSONL file, safe to share between
+    threads
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, method, params, result=None, elapsed=None, error=None,
+               request_id=None):
+        """
+        Args:
+            method (str): method name of the request
+            params (list): request parameters
+            result: value returned by the solution
+            elapsed (float): seconds the solution took
+            error (str): message of the exception the solution raised
+            request_id (str): id of the request, when known
+        """
+        entry = {'method': method, 'params': params}
+        if error is not None:
+            entry['error'] = error
+        else:
+            entry['result'] = result
+        if elapsed is not None:
+            entry['ms'] = round(elapsed * 1e3, 3)
+        if request_id is not None:
+            entry['id'] = request_id
+        line = _dumps(entry) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordedSolution(object):
+    """
+    Solution wrapper recording every call made through it
+    """
+
+    def __init__(self, method, solution, recorder):
+        self.method = method
+        self.solution = solution
+        self.recorder = recorder
+
+    def __call__(self, *params):
+        start = clock()
+        try:
+            result = self.solution(*params)
+        except Exception as e:
+            self.recorder.record(
+                self.method, list(params), elapsed=clock() - start,
+                error=str(e))
+            raise
+        self.recorder.record(
+            self.method, list(params), result, clock() - start)
+        return result
+
+
+def record_solutions(solutions, recorder):
+    """
+    Wraps each (method, solution) pair with RecordedSolution, or returns
+    them unchanged without a recorder
+    """
+    if recorder is None:
+        return solutions
+    return tuple(
+        (method, RecordedSolution(method, solution, recorder))
+        for method, solution in solutions
+    )
+
+
+def read_traffic(path):
+    """
+    Returns the entries of a traffic log, in order
+    """
+    with open(path) as log_file:
+        return [json.loads(line) for line in log_file if line.strip()]
+
+
+def replay(entries, solutions, repeat=1):
+    """
+    Calls the solutions with every recorded request as fast as possible
+    Args:
+        entries (list(dict)): traffic log entries
+        solutions (dict): {method name: solution}
+        repeat (int): times to go through the entries
+    Returns:
+        (dict): summary from runner.latency_stats.summarise over all
+            calls, plus one per method under 'methods'. A method's
+            requests_per_second is its calls over the whole replay's
+            wall time, so they add up to the overall rate
+        (list(tuple)): (entry, what the solution returned or raised) for
+            calls whose outcome differs from the recording
+    """
+    latencies = {}
+    mismatches = []
+    start = clock()
+    for _ in range(repeat):
+        for entry in entries:
+            solution = solutions.get(entry['method'])
+            call_start = clock()
+            try:
+                if solution is None:
+                    raise KeyError('no solution for %s' % entry['method'])
+                outcome = solution(*entry['params'])
+                failed = False
+            except Exception as e:
+                outcome = e
+                failed = True
+            latencies.setdefault(entry['method'], []).append(
+                clock() - call_start)
+
+            if failed != ('error' in entry) or (
+                not failed and not _same_result(outcome, entry['result'])
+            ):
+                mismatches.append((entry, outcome))
+    elapsed = clock() - start
+
+    summary = summarise(
+        [latency for values in latencies.values() for latency in values],
+        elapsed)
+    summary['methods'] = dict(
+        (method, summarise(values, elapsed))
+        for method, values in latencies.items())
+    return summary, mismatches
+
+
+def _same_result(outcome, recorded):
+    """
+    Compares what a solution returned with a recorded result, as it
+    would be sent in JSON. A result JSON cannot encode never matches.
+    """
+    try:
+        return json.loads(_dumps(outcome)) == recorded
+    except (TypeError, ValueError):
+        return False
@@ -1,12 +1,8 @@
 import sys
-from tdl.queue.queue_based_implementation_runner import QueueBasedImplementationRunnerBuilder
-from tdl.runner.challenge_session import ChallengeSession
-from solutions.SUM import sum_solution
-from solutions.HLO import hello_solution
-from solutions.FIZ import fizz_buzz_solution
-from solutions.CHK import checkout_solution
-from runner.utils import Utils
+from runner.solution_registry import SOLUTIONS, warm_up
+from runner.traffic_log import TrafficRecorder, record_solutions
 from runner.user_input_action import get_user_input
+from runner.utils import Utils
 
 
 """
@@ -50,16 +46,48 @@ from runner.user_input_action import get_user_input
  
 """
 
-runner = QueueBasedImplementationRunnerBuilder()\
-    .set_config(Utils.get_runner_config())\
-    .with_solution_for('sum', sum_solution.compute)\
-    .with_solution_for('hello', hello_solution.hello)\
-    .with_solution_for('fizz_buzz', fizz_buzz_solution.fizz_buzz)\
-    .with_solution_for('checkout', checkout_solution.checkout)\
-    .create()
+def main():
+    # import the solutions and compile the checkout catalog while the
+    # tdl client is imported and connects
+    warm_up([solution for _, solution in SOLUTIONS], background=True)
+
+    from tdl.runner.challenge_session import ChallengeSession
+
+    # set tdl_record_traffic in config/credentials.config to a file path
+    # to log every request and result, see benchmarks/replay_traffic.py
+    traffic_log = Utils.get_traffic_log()
+    recorder = TrafficRecorder(traffic_log) if traffic_log else None
+
+    # set tdl_runner_workers in config/credentials.config to answer
+    # requests concurrently, responses are still sent in request order
+    runner_workers = Utils.get_runner_workers()
+    if runner_workers > 1:
+        from runner.concurrent_runner import \
+            ConcurrentImplementationRunnerBuilder
+        runner_builder = ConcurrentImplementationRunnerBuilder()\
+            .with_workers(runner_workers)\
+            .with_recorder(recorder)
+        solutions = SOLUTIONS
+    else:
+        from tdl.queue.queue_based_implementation_runner import \
+            QueueBasedImplementationRunnerBuilder
+        runner_builder = QueueBasedImplementationRunnerBuilder()
+        solutions = record_solutions(SOLUTIONS, recorder)
+
+    runner_builder.set_config(Utils.get_runner_config())
+    for method_name, solution in solutions:
+        runner_builder.with_solution_for(method_name, solution)
+    runner = runner_builder.create()
+
+    ChallengeSession\
+        .for_runner(runner)\
+        .with_config(Utils.get_config())\
+        .with_action_provider(lambda: get_user_input(sys.argv[1:]))\
+        .start()
+
 
-ChallengeSession\
-    .for_runner(runner)\
-    .with_config(Utils.get_config())\
-    .with_action_provider(lambda: get_user_input(sys.argv[1:]))\
-    .start()
+# worker processes of the concurrent runner import this module again
+# where processes are spawned (eg. on Windows), the guard keeps them
+# from starting a session of their own
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Incremental basket for pricing at the till.
+
+A Basket keeps the running count of each SKU and the cost of each part
+of the catalog it prices separately: a single-SKU quantity pricer, a
+deal component, or a SKU without deals. Adding or removing an item only
+reprices the part that SKU belongs to, and total() always equals
+checkout_solution.checkout on the same items.
+"""
+from collections import Counter
+
+from solutions.CHK import checkout_solution
+
+
+class Basket(object):
+    """
+    Stateful basket with add, remove, undo and total
+    """
+
+    def __init__(self, catalog=None, exact=False):
+        """
+        Args:
+            catalog (checkout_solution.Catalog): catalog to price with,
+                defaults to the current one. The basket keeps using it
+                even if prices.csv is reloaded.
+            exact (bool): use the optimal deal solver
+        """
+        if catalog is None:
+            catalog = checkout_solution.get_catalog()
+        self.catalog = catalog
+        self.exact = exact
+        self.counts = [0] * len(catalog.skus)
+        # items added that are not in the catalog
+        self.unknown = Counter()
+        self._pricers = dict(catalog.quantity_pricers)
+        # cost of each separately priced part, keyed by pricer,
+        # component or sku index
+        self._part_costs = {}
+        self._total = 0
+        # (sku, +1 or -1) for each add or remove, latest last
+        self._history = []
+
+    def __len__(self):
+        return sum(self.counts) + sum(self.unknown.values())
+
+    def add(self, sku):
+        """
+        Adds one item to the basket
+        """
+        self._change(sku, 1)
+        self._history.append((sku, 1))
+
+    def remove(self, sku):
+        """
+        Removes one item from the basket
+        Raises:
+            ValueError: sku is not in the basket
+        """
+        index = self.catalog.sku_index.get(sku)
+        if (self.counts[index] if index is not None else self.unknown[sku]) < 1:
+            raise ValueError('%s is not in the basket' % sku)
+        self._change(sku, -1)
+        self._history.append((sku, -1))
+
+    def undo(self):
+        """
+        Reverts the last add or remove
+        Returns:
+            (str): sku of the reverted change
+        Raises:
+            IndexError: there is nothing to undo
+        """
+        if not self._history:
+            raise IndexError('nothing to undo')
+        sku, change = self._history.pop()
+        self._change(sku, -change)
+        return sku
+
+    def total(self):
+        """
+        Returns total cost of the basket, -1 if it contains an unknown item
+        """
+        if any(self.unknown.values()):
+            return -1
+        return self._total
+
+    def _change(self, sku, change):
+        index = self.catalog.sku_index.get(sku)
+        if index is None:
+            self.unknown[sku] += change
+            return
+
+        self.counts[index] += change
+        catalog = self.catalog
+        pricer = self._pricers.get(index)
+        component = catalog.component_of.get(index)
+        if pricer is not None:
+            part = pricer
+            cost = pricer.price(self.counts[index])
+        elif component is not None:
+            part = component
+            cost = component.price(self.counts, catalog.prices, self.exact)
+        else:
+            part = index
+            cost = self.counts[index] * catalog.prices[index]
+
+        self._total += cost - self._part_costs.get(part, 0)
+        self._part_costs[part] = cost
@@ -0,0 +1,98 @@
+"""
+Optional LRU cache of checkout results.
+
+enable_price_cache puts a PriceCache in front of pricing in
+checkout_solution.price_basket, so checkout and checkout_many look up
+each basket by its count vector before pricing it. The cache is off
+unless enabled.
+"""
+from collections import OrderedDict
+import threading
+
+from solutions.CHK import checkout_solution
+
+
+class PriceCache(object):
+    """
+    Bounded least recently used cache of basket totals, keyed by the
+    basket's count vector so baskets with the same items in a different
+    order share an entry. Entries belong to one catalog version, the
+    cache empties itself when a different catalog is used.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # (path, version) of the catalog the entries were priced with
+        self.catalog_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit, miss and eviction counters for tuning maxsize
+        """
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def price(self, counts, catalog, exact=False):
+        """
+        Returns total of basket counts, pricing it only on a cache miss
+        Args:
+            counts (list(int)) - quantity of each catalog item
+            catalog (checkout_solution.Catalog) - prices and deals to apply
+            exact (bool) - use the optimal deal solver
+        """
+        version = (catalog.path, catalog.version)
+        key = (exact, tuple(counts))
+        with self._lock:
+            if version != self.catalog_version:
+                self._entries.clear()
+                self.catalog_version = version
+            total_cost = self._entries.pop(key, None)
+            if total_cost is not None:
+                self.hits += 1
+                # re-insert as most recently used
+                self._entries[key] = total_cost
+                return total_cost
+            self.misses += 1
+
+        total_cost = checkout_solution.price_counts(counts, catalog, exact)
+
+        with self._lock:
+            if version == self.catalog_version:
+                self._entries[key] = total_cost
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return total_cost
+
+
+def enable_price_cache(maxsize=1024):
+    """
+    Puts a PriceCache in front of checkout pricing
+    Returns:
+        (PriceCache): the cache, for its stats
+    """
+    cache = PriceCache(maxsize)
+    checkout_solution.set_price_cache(cache)
+    return cache
+
+
+def disable_price_cache():
+    checkout_solution.set_price_cache(None)
@@ -0,0 +1,176 @@
+"""
+Pricing through Python source generated for the current catalog.
+
+generate_source writes a price(counts) function specialised to one
+catalog: prices and deal quantities are inlined as constants, the
+deals of each component are unrolled in the order checkout applies
+them, and every SKU without deals is folded into a single sum of
+products. The function is compiled once per catalog version and gives
+the same totals as checkout_solution.checkout (without exact).
+"""
+import threading
+
+from solutions.CHK import checkout_solution
+
+
+# name the generated function is compiled under
+FUNCTION_NAME = 'price'
+
+
+def _count(index):
+    return 'c%d' % index
+
+
+def _quantity_pricer_lines(index, pricer, table_name):
+    """
+    Inlined QuantityPricer.price for one SKU, added to total
+    """
+    return [
+        'q = counts[%d]' % index,
+        'if q <= %d:' % pricer.bound,
+        '    total += %s[q]' % table_name,
+        'else:',
+        '    p = (q - %d) // %d' % (pricer.bound - pricer.period + 1,
+                                     pricer.period),
+        '    total += %s[q - p * %d] + p * %d' % (
+            table_name, pricer.period, pricer.period_cost),
+    ]
+
+
+def _component_lines(component, prices):
+    """
+    Greedy evaluation of one component's deals, unrolled in order,
+    then the component's leftover items at their unit price
+    """
+    lines = [
+        '%s = counts[%d]' % (_count(index), index) for index in component.skus
+    ]
+    for deal in component.deals:
+        fits = [
+            '%s // %d' % (_count(index), quantity) if quantity > 1
+            else _count(index)
+            for index, quantity in deal.requirements
+        ]
+        times = fits[0] if len(fits) == 1 else 'min(%s)' % ', '.join(fits)
+        lines.append('# %s' % deal.deal)
+        lines.append('t = %s' % times)
+        lines.append('if t:')
+        lines.append('    total += t * %d' % deal.cost)
+        for index, quantity in deal.requirements:
+            lines.append('    %s -= t%s' % (
+                _count(index), ' * %d' % quantity if quantity > 1 else ''))
+    lines.append('total += %s' % ' + '.join(
+        '%s * %d' % (_count(index), prices[index])
+        for index in component.skus))
+    return lines
+
+
+def generate_source(catalog):
+    """
+    Writes the source of a pricing function for catalog
+    Args:
+        catalog (checkout_solution.Catalog): compiled catalog
+    Returns:
+        (str): source defining FUNCTION_NAME(counts), which returns the
+            total of a basket counted into a vector, without changing it
+        (dict): constants the source refers to, {name: value}
+    """
+    constants = {}
+    body = ['total = 0']
+
+    for index, pricer in catalog.quantity_pricers:
+        table_name = 'TABLE_%d' % index
+        constants[table_name] = pricer.table
+        body.extend(_quantity_pricer_lines(index, pricer, table_name))
+
+    for component in catalog.components:
+        body.extend(_component_lines(component, catalog.prices))
+
+    priced = set(index for index, _ in catalog.quantity_pricers)
+    priced.update(catalog.component_of)
+    independent = [
+        'counts[%d] * %d' % (index, price)
+        for index, price in enumerate(catalog.prices)
+        if index not in priced and price
+    ]
+    if independent:
+        body.append('total += %s' % ' + '.join(independent))
+    body.append('return total')
+
+    source = 'def %s(counts):\n%s\n' % (
+        FUNCTION_NAME, '\n'.join('    ' + line for line in body))
+    return source, constants
+
+
+def compile_pricer(catalog):
+    """
+    Generates and compiles the pricing function for catalog
+    Returns:
+        (function): price(counts) -> int
+    """
+    source, constants = generate_source(catalog)
+    code = compile(
+        source, '<catalog %s %s>' % (catalog.path, catalog.version), 'exec')
+    namespace = dict(constants)
+    exec(code, namespace)
+    return namespace[FUNCTION_NAME]
+
+
+# {catalog path: (catalog version, pricing function)}
+_pricers = {}
+_pricers_lock = threading.Lock()
+
+
+def get_pricer(catalog):
+    """
+    Returns the pricing function for catalog, only generating a new one
+    when the catalog version changes
+    """
+    cached = _pricers.get(catalog.path)
+    if cached is not None and cached[0] == catalog.version:
+        return cached[1]
+
+    with _pricers_lock:
+        cached = _pricers.get(catalog.path)
+        if cached is None or cached[0] != catalog.version:
+            cached = (catalog.version, compile_pricer(catalog))
+            _pricers[catalog.path] = cached
+    return cached[1]
+
+
+def checkout(skus):
+    """
+    Equivalent of checkout_solution.checkout using the generated
+    pricing function
+    Args:
+        skus (string) - the SKUs of all the products in the basket
+    Returns:
+        Integer representing the total checkout value of the items
+    """
+    catalog = checkout_solution.get_catalog()
+    if not skus:
+        return 0
+    counts = catalog.tokenizer.count(skus)
+    if counts is None:
+        return -1
+    return get_pricer(catalog)(counts)
+
+
+def checkout_many(baskets):
+    """
+    Equivalent of checkout_solution.checkout_many using the generated
+    pricing function
+    Args:
+        baskets (iterable(string)) - SKUs of each basket
+    Returns:
+        (list(int)): total for each basket in input order, -1 for
+            invalid baskets exactly like `checkout`
+    """
+    catalog = checkout_solution.get_catalog()
+    price = get_pricer(catalog)
+    count = catalog.tokenizer.count
+    totals = []
+    for skus in baskets:
+        counts = count(skus)
+        totals.append(-1 if counts is None else price(counts))
+    return totals
@@ -0,0 +1,114 @@
+"""
+Opt-in per-stage latency instrumentation for checkout.
+
+checkout_solution times its stages only while at least one stage hook
+is registered, otherwise the only cost is checking that stage_hooks is
+empty. A hook is called as hook(stage, seconds) after each stage.
+"""
+import threading
+import time
+
+
+# callables hook(stage, seconds) told how long each checkout stage took.
+# checkout only times its stages when at least one hook is registered
+stage_hooks = []
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def add_stage_hook(hook):
+    """
+    Registers hook(stage, seconds) to be called after each checkout stage
+    """
+    stage_hooks.append(hook)
+
+
+def remove_stage_hook(hook):
+    """
+    Unregisters a hook added with add_stage_hook
+    """
+    stage_hooks.remove(hook)
+
+
+class StageStats(object):
+    """
+    Stage hook aggregating call counts, wall time and a latency
+    histogram for each checkout stage. Histogram bucket b holds calls
+    that took under 2 ** b microseconds (and at least half that).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {stage: [calls, total seconds, max seconds, {bucket: calls}]}
+        self.stages = {}
+
+    def __call__(self, stage, seconds):
+        bucket = int(seconds * 1e6).bit_length()
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = [0, 0.0, 0.0, {}]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3][bucket] = stats[3].get(bucket, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def summary(self):
+        """
+        Returns a table of calls, mean, max and histogram per stage
+        """
+        lines = ['%-16s %10s %12s %12s  %s' % (
+            'stage', 'calls', 'mean (us)', 'max (us)',
+            'histogram (<us: calls)')]
+        with self._lock:
+            for stage, (calls, total, longest, histogram) in sorted(
+                self.stages.items()
+            ):
+                buckets = ', '.join(
+                    '<%d: %d' % (2 ** bucket, histogram[bucket])
+                    for bucket in sorted(histogram))
+                lines.append('%-16s %10d %12.2f %12.2f  %s' % (
+                    stage, calls, total / calls * 1e6, longest * 1e6,
+                    buckets))
+
+        return '\n'.join(lines)
+
+
+def enable_instrumentation():
+    """
+    Starts timing checkout stages
+    Returns:
+        (StageStats): collected statistics, see StageStats.summary
+    """
+    stats = StageStats()
+    add_stage_hook(stats)
+    return stats
+
+
+def disable_instrumentation():
+    """
+    Removes all stage hooks
+    """
+    del stage_hooks[:]
+
+
+def report(stage, seconds):
+    """
+    Tells every stage hook how long stage took
+    """
+    for hook in list(stage_hooks):
+        hook(stage, seconds)
+
+
+def timed(stage, function, *args):
+    """
+    Returns function(*args), reporting how long it took as stage
+    """
+    start = clock()
+    result = function(*args)
+    report(stage, clock() - start)
+    return result
@@ -0,0 +1,111 @@
+"""
+Vectorised batch pricing with NumPy.
+
+Prices many baskets at once as an (N, n_skus) count matrix, applying
+the compiled catalog column by column. Gives the same totals as
+checkout_solution.checkout. NumPy is an optional dependency, only
+needed when this module is imported.
+"""
+import numpy as np
+
+from solutions.CHK import checkout_solution
+
+
+# number of baskets counted in one (baskets x 256) bincount
+CHUNK_SIZE = 8192
+
+
+def _encode(skus):
+    if not isinstance(skus, bytes):
+        skus = skus.encode('utf-8')
+    return skus
+
+
+def count_baskets(baskets, catalog):
+    """
+    Counts baskets into a matrix with one row per basket and one column
+    per catalog item, with a single bincount over all baskets' bytes.
+    Args:
+        baskets (list(str)): SKUs of each basket
+        catalog (checkout_solution.Catalog): compiled catalog
+    Returns:
+        (numpy.ndarray): (N, n_skus) int64 item counts
+        (numpy.ndarray): (N,) bool, True for baskets with unknown items
+    """
+    encoded = [_encode(skus) for skus in baskets]
+    lengths = np.array([len(skus) for skus in encoded], dtype=np.int64)
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    # row of each byte, so byte counts of all baskets fit one bincount
+    rows = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+    byte_counts = np.bincount(
+        rows * 256 + data, minlength=len(encoded) * 256
+    ).reshape(len(encoded), 256)
+
+    columns = np.array(
+        [ord(item) for item in catalog.skus], dtype=np.int64)
+    counts = byte_counts[:, columns]
+    invalid = counts.sum(axis=1) != lengths
+    return counts, invalid
+
+
+def price_count_matrix(counts, catalog):
+    """
+    Prices every row of a count matrix the same way as
+    checkout_solution.price_basket
+    Args:
+        counts (numpy.ndarray): (N, n_skus) item counts, updated in place
+        catalog (checkout_solution.Catalog): compiled catalog
+    Returns:
+        (numpy.ndarray): (N,) int64 total of each basket
+    """
+    totals = np.zeros(len(counts), dtype=np.int64)
+
+    for index, pricer in catalog.quantity_pricers:
+        quantity = counts[:, index]
+        table = np.array(pricer.table, dtype=np.int64)
+        periods = np.maximum(
+            0, (quantity - pricer.bound + pricer.period - 1) // pricer.period)
+        totals += (
+            table[quantity - periods * pricer.period] +
+            periods * pricer.period_cost
+        )
+        counts[:, index] = 0
+
+    for deal in catalog.interacting_deals:
+        times = None
+        for index, quantity in deal.requirements:
+            fits = counts[:, index] // quantity
+            times = fits if times is None else np.minimum(times, fits)
+        totals += times * deal.cost
+        for index, quantity in deal.requirements:
+            counts[:, index] -= times * quantity
+
+    totals += counts.dot(np.array(catalog.prices, dtype=np.int64))
+    return totals
+
+
+def checkout_many(baskets):
+    """
+    Vectorised equivalent of checkout_solution.checkout_many. Catalogs
+    with multi-character SKUs are priced by checkout_many instead.
+    Args:
+        baskets (iterable(string)) - SKUs of each basket
+    Returns:
+        (list(int)): total for each basket in input order, -1 for
+            invalid baskets exactly like `checkout`
+    """
+    catalog = checkout_solution.get_catalog()
+    if catalog.tokenizer.max_length > 1:
+        # counting by byte only works for single character SKUs
+        return checkout_solution.checkout_many(baskets)
+
+    baskets = list(baskets)
+    totals = []
+    for start in range(0, len(baskets), CHUNK_SIZE):
+        counts, invalid = count_baskets(
+            baskets[start:start + CHUNK_SIZE], catalog)
+        chunk_totals = price_count_matrix(counts, catalog)
+        chunk_totals[invalid] = -1
+        totals.extend(chunk_totals.tolist())
+
+    return totals
@@ -0,0 +1,84 @@
+"""
+Parallel batch pricing over a pool of worker processes.
+
+The catalog is compiled in the calling process first, so a missing or
+broken prices file raises there exactly as it does for checkout_many.
+Each worker then compiles the same file, by absolute path, once when it
+starts, and prices baskets sent to it in chunks. Totals come back in
+input order.
+"""
+from itertools import islice
+import multiprocessing
+import os
+
+from solutions.CHK import checkout_solution
+
+
+# number of baskets sent to a worker at a time
+CHUNK_SIZE = 10000
+
+# prices file of this worker, and the exception compiling it raised
+_worker_path = None
+_worker_error = None
+
+
+def _init_worker(path):
+    # compile the catalog before the first chunk arrives. An exception
+    # here would make the pool restart the worker forever, so it is
+    # kept and raised from the first chunk instead.
+    global _worker_path, _worker_error
+    _worker_path = path
+    try:
+        checkout_solution.get_catalog(path)
+    except Exception as e:
+        _worker_error = e
+
+
+def _price_chunk(task):
+    if _worker_error is not None:
+        raise _worker_error
+    baskets, exact = task
+    return checkout_solution.checkout_many(
+        baskets, exact, checkout_solution.get_catalog(_worker_path))
+
+
+def _chunks(baskets, chunk_size, exact):
+    baskets = iter(baskets)
+    while True:
+        chunk = list(islice(baskets, chunk_size))
+        if not chunk:
+            return
+        yield chunk, exact
+
+
+def checkout_parallel(baskets, processes=None, chunk_size=CHUNK_SIZE,
+                      exact=False):
+    """
+    Prices a batch of baskets across a pool of worker processes
+    Args:
+        baskets (iterable(string)) - SKUs of each basket
+        processes (int) - number of workers, defaults to the CPU count
+        chunk_size (int) - number of baskets sent to a worker at a time
+        exact (bool) - use the optimal deal solver
+    Returns:
+        (list(int)): total for each basket in input order, -1 for
+            invalid baskets exactly like `checkout`
+    """
+    path = os.path.abspath(checkout_solution.PRICES_FILE)
+    checkout_solution.get_catalog(path)
+    pool = multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(path,))
+    try:
+        totals = []
+        for chunk_totals in pool.imap(
+            _price_chunk, _chunks(baskets, chunk_size, exact)
+        ):
+            totals.extend(chunk_totals)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return totals
@@ -1,21 +1,60 @@
-from collections import Counter
+from collections import Counter, namedtuple
 import csv
 import operator
+import os
 import re
+import threading
+import time
 
+from solutions.CHK.checkout_instrumentation import (
+    clock, report, stage_hooks, timed)
 
-def load_prices():
+
+PRICES_FILE = 'prices.csv'
+# minimum number of seconds between checks of the prices file for changes
+CATALOG_CHECK_INTERVAL = 1.0
+
+# baskets at least this long are counted with one str.count pass per
+# SKU, shorter ones with a single Python loop over the basket
+COUNT_PASS_THRESHOLD = 100
+
+# most entries a QuantityPricer table may have. Catalogs whose single
+# SKU deals would need more, eg. co-prime quantities in the hundreds,
+# are rejected when compiled
+QUANTITY_TABLE_LIMIT = 100000
+
+# results kept per deal component before its cache is emptied
+COMPONENT_CACHE_SIZE = 4096
+
+# distinct baskets checkout_many remembers before it starts afresh
+CHECKOUT_MANY_CACHE_SIZE = 4096
+
+# number of SKUs read at a time by checkout_stream
+STREAM_CHUNK_SIZE = 1 << 16
+
+# compiled form of a deal. requirements is a tuple of
+# (sku_index, quantity) pairs, saving and cost are plain ints
+Deal = namedtuple('Deal', ['deal', 'requirements', 'saving', 'cost'])
+
+
+def load_prices(path=PRICES_FILE):
     """
     Loads data from storage (prices.csv)
+    Args:
+        path (str): location of the prices file
     Returns:
         item_prices (dict): price information for each item - {item: price}
         item_deals (set): all unique deals in the dataset
     """
     item_prices = {}
     item_deals = set([])
-    with open('prices.csv') as csv_file:
+    with open(path) as csv_file:
         csv_reader = csv.reader(csv_file, delimiter=';')
-        for (item, price, deals) in csv_reader:
+        for row in csv_reader:
+            if not row:
+                # skip blank lines
+                continue
+            (item, price, deals) = row
             item_prices[item] = int(price)
             for deal in deals.split(', '):
                 if deal:
@@ -24,21 +63,27 @@ def load_prices():
     return item_prices, item_deals
 
 
-def parse_deal_code(deal_code):
+def parse_deal_code(deal_code, skus=None):
     """
     Converts an sku and it's quantity into separate parts.
     eg.
     A -> 1, A
     3A -> 3, A
+    3AB12 -> 3, AB12 (when AB12 is one of skus)
     Args:
         deal_code (string) - contains sku item and an optional quantity
                         (defaults to 1)
+        skus (collection) - known sku codes. When given, the item can be
+                        any known sku, including ones with digits in them
     Returns:
         int - quantity of item
         str - item sku code
     """
+    if skus is not None:
+        return parse_known_deal_code(deal_code, skus)
+
     # separate numbers and letters
-    result = re.findall('\d+|\D+', deal_code)
+    result = re.findall(r'\d+|\D+', deal_code)
     if len(result) == 1:
         # if quantity not specified, default to 1
         quantity = 1
@@ -53,7 +98,26 @@ def parse_deal_code(deal_code):
     return quantity, item
 
 
+def parse_known_deal_code(deal_code, skus):
+    """
+    Splits deal_code into a quantity and a known sku. Leading digits are
+    taken as the quantity where possible, so with skus 2A and A, 32A is
+    read as 32 x A.
+    Args:
+        deal_code (string) - contains sku item and an optional quantity
+        skus (collection) - known sku codes
+    Returns:
+        int - quantity of item (None if deal_code has no known sku)
+        str - item sku code (None if deal_code has no known sku)
+    """
+    digits = len(deal_code) - len(deal_code.lstrip('0123456789'))
+    for split in range(digits, -1, -1):
+        item = deal_code[split:]
+        if item in skus:
+            quantity = int(deal_code[:split]) if split else 1
+            return quantity, item
 
+    return None, None
 
 
 def get_deal_info(deal, item):
@@ -87,20 +151,21 @@ def get_cost(prices, item, quantity):
     return quantity * prices[item]
 
 
-def aggregate_requirements(groups):
+def aggregate_requirements(groups, skus=None):
     """
     Returns requirements for deal from multiple groups.
     If the groups contain the same item then they should be combined.
     eg. 2F, F should count as needing 3 F's to apply the deal
     Args:
         groups (tuple) items and quantities required
+        skus (collection) known sku codes, see parse_deal_code
     Returns:
         (collections.Counter): items and quantity required to complete deal
             eg. {'F': 3}
     """
     requirements = Counter()
     for group in groups:
-        quantity, item = parse_deal_code(group)
+        quantity, item = parse_deal_code(group, skus)
         requirements.update({item: quantity})
 
     return requirements
@@ -118,20 +183,22 @@ def calculate_saving(deal, item_prices):
         saving (int): total saving this deal gives
         cost (int): cost of deal
     """
-    free_re = re.search(r'(\w+) get one ([^\n]+) free', deal)
+    free_re = re.search(r'(\S+) get one ([^\n]+) free', deal)
     if free_re:
         # saving is value of free item
         saving = item_prices[free_re.group(2)]
-        requirements = aggregate_requirements(free_re.groups())
-        quantity, item = parse_deal_code(free_re.group(1))
+        requirements = aggregate_requirements(free_re.groups(), item_prices)
+        quantity, item = parse_deal_code(free_re.group(1), item_prices)
         cost = get_cost(item_prices, item, quantity)
     else:
         # assuming for now that all other deals are just x-for
         # saving is difference between deal price and quantity * base price
-        [(deal_code_quantity, deal_price)] = re.findall(r'(\w+) for (\w+)', deal)
-        deal_quantity, deal_item = parse_deal_code(deal_code_quantity)
+        [(deal_code_quantity, deal_price)] = re.findall(r'(\S+) for (\w+)', deal)
+        deal_quantity, deal_item = parse_deal_code(
+            deal_code_quantity, item_prices)
         saving = (deal_quantity * item_prices[deal_item]) - int(deal_price)
-        requirements = aggregate_requirements([deal_code_quantity])
+        requirements = aggregate_requirements(
+            [deal_code_quantity], item_prices)
         cost = int(deal_price)
 
     return requirements, saving, cost
@@ -159,6 +226,627 @@ def get_ordered_deals(item_prices, item_deals):
     return deal_savings
 
 
+def check_deal(deal, item_prices):
+    """
+    Checks that a deal is in one of the supported formats and only
+    refers to known items in positive quantities
+    eg. "3A for 130", "2E get one B free"
+    Args:
+        deal (str): deal information
+        item_prices (dict): {item: price}
+    Returns:
+        (str): what is wrong with the deal, None if it is valid
+    """
+    free_re = re.match(r'(\S+) get one (\S+) free$', deal)
+    if free_re:
+        deal_codes = [free_re.group(1)]
+        if free_re.group(2) not in item_prices:
+            return 'unknown free item %s' % free_re.group(2)
+    else:
+        for_re = re.match(r'(\S+) for (\d+)$', deal)
+        if not for_re:
+            return 'unrecognised format'
+        deal_codes = [for_re.group(1)]
+
+    for deal_code in deal_codes:
+        quantity, item = parse_deal_code(deal_code, item_prices)
+        if item is None:
+            return 'unknown item in %s' % deal_code
+        if quantity < 1:
+            return 'quantity of %s must be at least 1' % deal_code
+
+    return None
+
+
+def compile_deals(item_prices, item_deals, sku_index):
+    """
+    Parses every deal once into an immutable table ordered by saving
+    (best first), so applying deals is just integer arithmetic.
+    Args:
+        item_prices (dict): {item: price}
+        item_deals (set): set([deal1, deal2, etc.])
+        sku_index (dict): {item: position of item in basket count vector}
+    Returns:
+        (tuple(Deal)): ordered deals with requirements as
+            ((sku_index, quantity), ..) pairs
+    Raises:
+        ValueError: some deals are invalid, listing all of them
+    """
+    problems = []
+    for deal in sorted(item_deals):
+        problem = check_deal(deal, item_prices)
+        if problem is not None:
+            problems.append('%r: %s' % (deal, problem))
+    if problems:
+        raise ValueError('invalid deals: %s' % '; '.join(problems))
+
+    deals = []
+    for deal, requirements, saving, cost in get_ordered_deals(
+        item_prices, item_deals
+    ):
+        requirements = tuple(sorted(
+            (sku_index[item], quantity)
+            for item, quantity in requirements.items()
+        ))
+        deals.append(Deal(deal, requirements, saving, cost))
+
+    # sort by saving in descending order, deal text keeps ties stable
+    deals.sort(key=lambda compiled: (-compiled.saving, compiled.deal))
+    return tuple(deals)
+
+
+class QuantityPricer(object):
+    """
+    Optimal price for any quantity of a single SKU whose deals only
+    involve that SKU (eg. 3A for 130, 5A for 200).
+
+    Prices are precomputed up to a bound by unbounded knapsack over the
+    offers. Beyond the bound the optimal basket always contains the
+    offer with the lowest cost per item (period): any `period` other
+    offers contain a subset whose quantities add up to a multiple of
+    period, which that offer can replace for no more money. So
+    price(n) = price(n - period) + period_cost past the bound, which
+    makes any quantity an O(1) lookup.
+    """
+
+    def __init__(self, unit_price, offers):
+        """
+        Args:
+            unit_price (int): price of a single item
+            offers (iterable(tuple)): (quantity, cost) of each deal
+        Raises:
+            ValueError: the price table would have more than
+                QUANTITY_TABLE_LIMIT entries
+        """
+        offers = [(1, unit_price)] + list(offers)
+        self.period, self.period_cost = offers[0]
+        for quantity, cost in offers[1:]:
+            # lowest cost per item, cross multiplied to stay exact
+            if cost * self.period < self.period_cost * quantity:
+                self.period, self.period_cost = quantity, cost
+        self.bound = self.period * max(
+            quantity for quantity, _ in offers)
+        if self.bound > QUANTITY_TABLE_LIMIT:
+            raise ValueError(
+                'price table of %d entries is over QUANTITY_TABLE_LIMIT (%d)'
+                % (self.bound, QUANTITY_TABLE_LIMIT))
+
+        table = [0]
+        for quantity in range(1, self.bound + 1):
+            table.append(min(
+                table[quantity - offer_quantity] + offer_cost
+                for offer_quantity, offer_cost in offers
+                if offer_quantity <= quantity
+            ))
+        self.table = tuple(table)
+
+    def price(self, quantity):
+        """
+        Returns the cheapest cost of `quantity` items
+        """
+        if quantity <= self.bound:
+            return self.table[quantity]
+        # number of best value offers that take quantity back into table
+        periods = (quantity - self.bound + self.period - 1) // self.period
+        return (
+            self.table[quantity - periods * self.period] +
+            periods * self.period_cost
+        )
+
+
+def compile_quantity_pricers(ordered_deals, prices):
+    """
+    Separates SKUs whose deals only involve themselves, and so can be
+    priced from their own quantity, from deals that combine SKUs.
+    Args:
+        ordered_deals (tuple(Deal)): compiled deals
+        prices (tuple(int)): price of each item
+    Returns:
+        (tuple): ((sku_index, QuantityPricer), ..) for single SKU items
+        (tuple(Deal)): deals left to apply on the rest of the basket
+    Raises:
+        ValueError: the deals of an item need too big a price table
+    """
+    deals_by_sku = {}
+    for deal in ordered_deals:
+        for index, _ in deal.requirements:
+            deals_by_sku.setdefault(index, []).append(deal)
+
+    quantity_pricers = []
+    for index, deals in sorted(deals_by_sku.items()):
+        if all(len(deal.requirements) == 1 for deal in deals):
+            offers = [(deal.requirements[0][1], deal.cost) for deal in deals]
+            try:
+                pricer = QuantityPricer(prices[index], offers)
+            except ValueError as e:
+                raise ValueError('invalid deals: %s: %s' % (
+                    ', '.join(repr(deal.deal) for deal in deals), e))
+            quantity_pricers.append((index, pricer))
+
+    single_skus = set(index for index, _ in quantity_pricers)
+    interacting_deals = tuple(
+        deal for deal in ordered_deals
+        if deal.requirements[0][0] not in single_skus
+    )
+    return tuple(quantity_pricers), interacting_deals
+
+
+class DealIndex(object):
+    """
+    Inverted index from SKU to the deals that need it, so a basket only
+    looks at deals whose SKUs are all in the basket. Each deal is filed
+    under its lowest SKU index and carries a bitmask of the SKUs it
+    requires.
+    """
+
+    def __init__(self, ordered_deals):
+        """
+        Args:
+            ordered_deals (tuple(Deal)): compiled deals, best saving first
+        """
+        self.deals = ordered_deals
+        # bit i set when the deal requires the item at sku index i
+        self.masks = tuple(
+            sum(1 << index for index, _ in deal.requirements)
+            for deal in ordered_deals
+        )
+        by_sku = {}
+        for position, deal in enumerate(ordered_deals):
+            by_sku.setdefault(deal.requirements[0][0], []).append(position)
+        self.by_sku = dict(
+            (index, tuple(positions)) for index, positions in by_sku.items())
+
+    def candidates(self, counts, indices=None):
+        """
+        Returns the deals, in order, whose SKUs are all in the basket
+        Args:
+            counts (list(int)): Occurrences of each item in basket
+            indices (iterable(int)): sku indices to look at, defaults to
+                all of them
+        Returns:
+            (list(Deal))
+        """
+        if indices is None:
+            indices = range(len(counts))
+        by_sku = self.by_sku
+        present = 0
+        positions = []
+        for index in indices:
+            if counts[index]:
+                present |= 1 << index
+                if index in by_sku:
+                    positions.extend(by_sku[index])
+
+        masks = self.masks
+        deals = self.deals
+        return [
+            deals[position] for position in sorted(positions)
+            if not masks[position] & ~present
+        ]
+
+
+class Component(object):
+    """
+    SKUs tied together by deals that share items, with those deals.
+    Components share no SKUs, so a basket is priced as the sum of its
+    components priced independently. Results are cached per component
+    on the counts of its own SKUs.
+
+    A component only has a handful of SKUs and deals, so the greedy
+    pricing works on a vector of just its own counts, with each deal's
+    requirements as positions in that vector, and tries every deal in
+    order instead of looking them up in a DealIndex.
+    """
+
+    def __init__(self, skus, deals):
+        """
+        Args:
+            skus (tuple(int)): sku indices in the component
+            deals (tuple(Deal)): the component's deals, best saving first
+        """
+        self.skus = skus
+        self.deals = deals
+        position = dict((index, pos) for pos, index in enumerate(skus))
+        # (requirements as (position, quantity) pairs, cost) of each deal
+        self._steps = tuple(
+            (
+                tuple((position[index], quantity)
+                      for index, quantity in deal.requirements),
+                deal.cost,
+            )
+            for deal in deals
+        )
+        # (prices, price of each of skus) from the last call to price
+        self._own_prices = (None, None)
+        self._cache = {}
+
+    def price(self, counts, prices, exact=False):
+        """
+        Returns cost of the component's items in the basket
+        Args:
+            counts (list(int)): Occurrences of each item in basket
+            prices (tuple(int)): price of each item
+            exact (bool): use the optimal deal solver
+        """
+        skus = self.skus
+        own = [counts[index] for index in skus]
+        key = (exact, tuple(own))
+        cost = self._cache.get(key)
+        if cost is not None:
+            return cost
+
+        if exact:
+            # only deals that save money and fit the basket can apply
+            cost = solve_group_exact(counts, skus, [
+                deal for deal in self.deals
+                if deal.saving > 0 and all(
+                    counts[index] >= quantity
+                    for index, quantity in deal.requirements)
+            ], prices)
+        else:
+            cost = 0
+            for requirements, deal_cost in self._steps:
+                # number of times the deal fits in what is left
+                times = None
+                for pos, quantity in requirements:
+                    fits = own[pos] // quantity
+                    if times is None or fits < times:
+                        times = fits
+                if times:
+                    cost += times * deal_cost
+                    for pos, quantity in requirements:
+                        own[pos] -= times * quantity
+            own_prices = self._own_prices
+            if own_prices[0] is not prices:
+                own_prices = self._own_prices = (
+                    prices, [prices[index] for index in skus])
+            cost += sum(map(operator.mul, own, own_prices[1]))
+
+        if len(self._cache) >= COMPONENT_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = cost
+        return cost
+
+    def clear_cache(self):
+        """
+        Forgets cached results, eg. to time pricing on a cache miss
+        """
+        self._cache.clear()
+
+
+class SkuTokenizer(object):
+    """
+    Splits a basket string into catalog SKUs by longest match in one
+    pass over the basket, using a trie of the SKU codes. Catalogs where
+    every SKU is a single character use count_items directly.
+    """
+
+    # key marking the end of a sku in a trie node
+    END = None
+
+    def __init__(self, skus):
+        """
+        Args:
+            skus (tuple(str)): catalog SKUs, in count vector order
+        """
+        self.sku_index = dict((item, index) for index, item in enumerate(skus))
+        self.max_length = max([len(item) for item in skus] or [1])
+        self.trie = {}
+        for index, item in enumerate(skus):
+            node = self.trie
+            for character in item:
+                node = node.setdefault(character, {})
+            node[self.END] = index
+
+    def count(self, basket):
+        """
+        Returns quantity of each catalog item in basket, or None if the
+        basket contains anything that is not a catalog SKU
+        """
+        counts, position = self.count_prefix(basket, partial=False)
+        return counts
+
+    def count_prefix(self, basket, partial=True):
+        """
+        Counts SKUs from the start of basket. With partial, stops where
+        fewer than max_length characters are left since the SKU found
+        there could depend on what follows, eg. in the next chunk of a
+        stream.
+        Returns:
+            (list(int)): quantity of each catalog item, None if invalid
+            (int): position in basket where counting stopped
+        """
+        if self.max_length == 1:
+            return count_items(basket, self.sku_index), len(basket)
+
+        counts = [0] * len(self.sku_index)
+        trie = self.trie
+        end = self.END
+        length = len(basket)
+        stop = length - self.max_length + 1 if partial else length
+        position = 0
+        while position < stop:
+            node = trie
+            match = None
+            cursor = position
+            while cursor < length:
+                node = node.get(basket[cursor])
+                if node is None:
+                    break
+                cursor += 1
+                if end in node:
+                    match = cursor
+                    index = node[end]
+            if match is None:
+                # invalid input
+                return None, position
+            counts[index] += 1
+            position = match
+
+        return counts, position
+
+
+class Catalog(object):
+    """
+    Prices and deals compiled once from the prices file and shared by
+    every checkout until the file changes.
+    """
+
+    def __init__(self, path, version, item_prices, item_deals):
+        self.path = path
+        # (mtime, size, inode) of the prices file this catalog was built from
+        self.version = version
+        self.item_prices = item_prices
+        self.item_deals = item_deals
+        # baskets are counted into vectors indexed by position in skus
+        self.skus = tuple(sorted(item_prices))
+        self.sku_index = dict(
+            (item, index) for index, item in enumerate(self.skus))
+        self.prices = tuple(item_prices[item] for item in self.skus)
+        self.tokenizer = SkuTokenizer(self.skus)
+        self.ordered_deals = compile_deals(
+            item_prices, item_deals, self.sku_index)
+        self.quantity_pricers, self.interacting_deals = \
+            compile_quantity_pricers(self.ordered_deals, self.prices)
+        self.components = tuple(
+            Component(group_skus, tuple(group_deals))
+            for group_skus, group_deals in group_interacting_deals(
+                self.interacting_deals)
+        )
+        # component of each sku index that belongs to one
+        self.component_of = dict(
+            (index, component)
+            for component in self.components for index in component.skus)
+
+
+def file_version(path):
+    """
+    Returns (mtime, size, inode) of file, used to detect changes to
+    prices file, including replacing it by renaming another file over it
+    """
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size, stat.st_ino
+
+
+def compile_catalog(path=PRICES_FILE):
+    """
+    Loads and parses the prices file into a Catalog
+    Args:
+        path (str): location of the prices file
+    Returns:
+        (Catalog)
+    """
+    version = file_version(path)
+    item_prices, item_deals = load_prices(path)
+    return Catalog(path, version, item_prices, item_deals)
+
+
+class CatalogManager(object):
+    """
+    Owns the current catalog for one prices file and swaps in a newly
+    compiled one when the file changes. Swapping is a single attribute
+    assignment, so a checkout that already holds the old catalog
+    finishes with it while new checkouts see the new one.
+
+    Without a watcher the file is checked inline, at most once every
+    CATALOG_CHECK_INTERVAL seconds. start() moves the checks and
+    recompiles to a background thread so requests never do file I/O.
+    """
+
+    def __init__(self, path=PRICES_FILE):
+        self.path = path
+        self.catalog = None
+        # number of catalogs compiled so far
+        self.generation = 0
+        self.loaded_at = None
+        self.last_reload_seconds = None
+        # exception from the last failed reload, and the version of the
+        # file it failed on, cleared on success
+        self.last_error = None
+        self.failed_version = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @property
+    def version(self):
+        """
+        (mtime, size, inode) of the prices file the current catalog
+        was compiled from
+        """
+        catalog = self.catalog
+        return catalog.version if catalog is not None else None
+
+    def current(self):
+        """
+        Returns the current catalog, compiling it on first use
+        """
+        catalog = self.catalog
+        if catalog is None:
+            return self.reload()
+        if self._watcher is None:
+            now = time.time()
+            if now - self._checked_at >= CATALOG_CHECK_INTERVAL:
+                self._checked_at = now
+                if self.check():
+                    return self.catalog
+        return catalog
+
+    def check(self):
+        """
+        Recompiles the catalog if the prices file has changed. If that
+        fails the current catalog stays in use, the error is kept in
+        last_error and that version of the file is not compiled again.
+        Returns:
+            (bool): a new catalog was swapped in
+        """
+        catalog = self.catalog
+        version = None
+        try:
+            version = file_version(self.path)
+            if catalog is not None and version in (
+                catalog.version, self.failed_version
+            ):
+                return False
+            self.reload()
+        except Exception as e:
+            if self.catalog is None:
+                raise
+            self.last_error = e
+            self.failed_version = version
+            return False
+        return True
+
+    def reload(self):
+        """
+        Compiles the prices file and swaps the new catalog in
+        Returns:
+            (Catalog): the new catalog
+        """
+        with self._reload_lock:
+            start = clock()
+            catalog = timed('compile_catalog', compile_catalog, self.path)
+            self.last_reload_seconds = clock() - start
+            self.loaded_at = time.time()
+            self.last_error = None
+            self.failed_version = None
+            self.generation += 1
+            self.catalog = catalog
+        return catalog
+
+    def invalidate(self):
+        """
+        Drops the current catalog so the next use compiles it again
+        """
+        self.catalog = None
+
+    def start(self, poll_interval=None):
+        """
+        Starts a daemon thread polling the prices file for changes
+        Args:
+            poll_interval (float): seconds between checks, defaults to
+                CATALOG_CHECK_INTERVAL
+        """
+        if self._watcher is not None:
+            return
+        if self.catalog is None:
+            self.reload()
+        if poll_interval is None:
+            poll_interval = CATALOG_CHECK_INTERVAL
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(poll_interval,),
+            name='catalog-watcher')
+        self._watcher.daemon = True
+        self._watcher.start()
+
+    def stop(self):
+        """
+        Stops the watcher thread, checks go back to being inline
+        """
+        watcher = self._watcher
+        if watcher is None:
+            return
+        self._stop.set()
+        watcher.join()
+        self._watcher = None
+
+    def _watch(self, poll_interval):
+        while not self._stop.wait(poll_interval):
+            self.check()
+
+
+_catalog_managers = {}
+_catalog_managers_lock = threading.Lock()
+
+
+def get_catalog_manager(path=PRICES_FILE):
+    """
+    Returns the process-wide CatalogManager of a prices file
+    """
+    manager = _catalog_managers.get(path)
+    if manager is None:
+        with _catalog_managers_lock:
+            manager = _catalog_managers.setdefault(path, CatalogManager(path))
+    return manager
+
+
+def get_catalog(path=PRICES_FILE):
+    """
+    Returns the process-wide catalog, only recompiling it when the
+    prices file has changed, see CatalogManager
+    Args:
+        path (str): location of the prices file
+    Returns:
+        (Catalog)
+    """
+    manager = _catalog_managers.get(path)
+    if manager is None:
+        manager = get_catalog_manager(path)
+    return manager.current()
+
+
+def start_catalog_watcher(path=PRICES_FILE, poll_interval=None):
+    """
+    Compiles the catalog now and reloads it in the background whenever
+    the prices file changes
+    Returns:
+        (CatalogManager)
+    """
+    manager = get_catalog_manager(path)
+    manager.start(poll_interval)
+    return manager
+
+
+def invalidate_catalog():
+    """
+    Forces the next checkout to reload the prices file
+    """
+    for manager in list(_catalog_managers.values()):
+        manager.invalidate()
+
+
 def requirements_satisfied(items_counter, requirements):
     """
     Checks if items in requirements are present in basket (items_counter)
@@ -170,12 +858,8 @@ def requirements_satisfied(items_counter, requirements):
     Returns:
         (bool) are requirements for this deal met
     """
-    for item, quantity in requirements.iteritems():
-        if (
-            None in (quantity, item)
-            or item not in items_counter
-            or items_counter[item] < quantity
-        ):
+    for item, quantity in requirements.items():
+        if items_counter[item] < quantity:
             # requirements for this deal not satisfied
             return False
 
@@ -183,85 +867,448 @@ def requirements_satisfied(items_counter, requirements):
     return True
 
 
-def evaluate_deals(items_counter, ordered_deals):
+def count_items(skus, sku_index):
+    """
+    Counts the basket into a vector indexed by catalog position. Short
+    baskets are counted with a loop over the basket, long ones with a
+    C-speed str.count per SKU, checking that every item was counted.
+    Args:
+        skus (str): the SKUs of all the products in the basket
+        sku_index (dict): {item: position of item in count vector}
+    Returns:
+        (list(int)): quantity of each catalog item in the basket, or None
+            if the basket contains an unknown item
+    """
+    if len(skus) >= COUNT_PASS_THRESHOLD:
+        counts = [
+            skus.count(item) for item in sorted(sku_index, key=sku_index.get)]
+        if sum(counts) != len(skus):
+            # invalid input
+            return None
+        return counts
+
+    counts = [0] * len(sku_index)
+    try:
+        for item in skus:
+            counts[sku_index[item]] += 1
+    except KeyError:
+        # invalid input
+        return None
+
+    return counts
+
+
+def evaluate_deals(counts, ordered_deals):
     """
-    Iterates through deals (best deals first) and applies as many
-    as possible to customer basket (and removes these items so they
-    are not counted again).
+    Iterates through deals (best deals first) and applies each one as
+    many times as possible to customer basket in a single step (and
+    removes these items so they are not counted again).
     Args:
-        items_counter (collections.Counter): Occurrences of each item in basket
-        ordered_deals (list(tuples)): [(deal, requirements, saving, deal_cost)]
+        counts (list(int)): Occurrences of each item in basket
+        ordered_deals (tuple(Deal)): compiled deals, best saving first
     Returns:
         (int): cost of deals
-        updated items_counter
+        updated counts
     """
     total_cost = 0
-    for (deal, requirements, saving, deal_cost) in ordered_deals:
-        reqs_satisfied = requirements_satisfied(items_counter, requirements)
-        # sanity check to avoid infinite loop. Assuming someone can't
-        # apply a deal more than ctr times
-        ctr = 10
-        # loop in order to apply deal as many times as is valid
-        while reqs_satisfied and ctr > 0:
-            ctr -= 1
-            total_cost += deal_cost
+    for deal in ordered_deals:
+        requirements = deal.requirements
+        # number of times the deal fits in what is left of the basket
+        times = min(
+            counts[index] // quantity for index, quantity in requirements)
+        if times:
+            total_cost += times * deal.cost
             # subtract items from basket
-            items_counter -= requirements
+            for index, quantity in requirements:
+                counts[index] -= times * quantity
+
+    return total_cost, counts
 
-            # recalculate for next loop iteration
-            reqs_satisfied = requirements_satisfied(
-                items_counter, requirements)
 
-    return total_cost, items_counter
+def evaluate_quantity_pricers(counts, quantity_pricers):
+    """
+    Gets cost of items whose deals only involve themselves from their
+    lookup tables (and removes these items from the basket)
+    Args:
+        counts (list(int)): Occurrences of each item in basket
+        quantity_pricers (tuple): ((sku_index, QuantityPricer), ..)
+    Returns:
+        (int): cost of these items
+    """
+    total_cost = 0
+    for index, pricer in quantity_pricers:
+        quantity = counts[index]
+        if quantity:
+            total_cost += pricer.price(quantity)
+            counts[index] = 0
+
+    return total_cost
 
 
-def evaluate_remaining_items(items_counter, item_prices):
+def evaluate_remaining_items(counts, prices):
     """
     Gets cost of items not in deals
+    Args:
+        counts (list(int)): Occurrences of each item left in basket
+        prices (tuple(int)): price of each item, in the same order
+    """
+    return sum(map(operator.mul, counts, prices))
+
+def evaluate_components(counts, components, prices, exact=False):
+    """
+    Gets cost of items in deal components, pricing only the components
+    with items in the basket (and removes these items from the basket)
+    Args:
+        counts (list(int)): Occurrences of each item in basket
+        components (tuple(Component)): catalog deal components
+        prices (tuple(int)): price of each item
+        exact (bool): use the optimal deal solver
+    Returns:
+        (int): cost of these items
     """
     total_cost = 0
-    # for any remaining items, just add cost
-    for item, quantity in items_counter.iteritems():
-        if None in (item, quantity) or item not in item_prices:
-            # invalid input
-            return -1
-        else:
-            item_cost = get_cost(item_prices, item, quantity)
-            if item_cost is None:
-                # invalid input
-                return -1
-            else:
-                total_cost += item_cost
+    for component in components:
+        skus = component.skus
+        if any([counts[index] for index in skus]):
+            total_cost += component.price(counts, prices, exact)
+            for index in skus:
+                counts[index] = 0
 
     return total_cost
 
+
+def group_interacting_deals(deals):
+    """
+    Splits deals into groups that share no SKUs, so each group can be
+    priced independently of the others.
+    Args:
+        deals (iterable(Deal)): compiled deals
+    Returns:
+        (list(tuple)): [(sku indices of group, deals of group in order), ..]
+    """
+    # union-find over sku indices, joining all SKUs of each deal
+    parent = {}
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for deal in deals:
+        indices = [index for index, _ in deal.requirements]
+        for index in indices:
+            parent.setdefault(index, index)
+        for index in indices[1:]:
+            parent[find(index)] = find(indices[0])
+
+    groups = {}
+    for deal in deals:
+        root = find(deal.requirements[0][0])
+        groups.setdefault(root, []).append(deal)
+
+    return [
+        (
+            tuple(sorted(set(
+                index for deal in group for index, _ in deal.requirements))),
+            group,
+        )
+        for _, group in sorted(groups.items())
+    ]
+
+
+def solve_group_exact(counts, group_skus, group_deals, prices):
+    """
+    Finds the cheapest way of pricing the items of one group of
+    interacting deals, trying every number of applications of every
+    deal but the last. Sub-results are memoised on (deal, remaining
+    counts of the group's SKUs).
+
+    The last deal is applied in closed form: what is left after it is
+    priced per item, so the cost is linear in the number of times it is
+    applied and the best is either none or as many as fit. That takes a
+    whole dimension out of the search, so a group of two deals is
+    solved in time linear in the basket size.
+    Args:
+        counts (list(int)): Occurrences of each item in basket
+        group_skus (tuple(int)): sku indices touched by the group
+        group_deals (list(Deal)): deals of the group
+        prices (tuple(int)): price of each item
+    Returns:
+        (int): minimum cost of the group's items
+    """
+    position = dict((index, pos) for pos, index in enumerate(group_skus))
+    group_prices = [prices[index] for index in group_skus]
+    # (requirements as (position, quantity) pairs, cost, change in cost
+    # per application) for each deal
+    steps = []
+    for deal in group_deals:
+        requirements = tuple(
+            (position[index], quantity)
+            for index, quantity in deal.requirements)
+        steps.append((
+            requirements,
+            deal.cost,
+            deal.cost - sum(
+                quantity * group_prices[pos] for pos, quantity in requirements),
+        ))
+    last_step = len(steps) - 1
+    memo = {}
+
+    def best_cost(step, state):
+        if step >= last_step:
+            unit_cost = sum(map(operator.mul, state, group_prices))
+            if step > last_step:
+                return unit_cost
+            requirements, _, cost_change = steps[step]
+            times = min(state[pos] // quantity for pos, quantity in requirements)
+            return unit_cost + min(0, times * cost_change)
+
+        key = (step, state)
+        if key in memo:
+            return memo[key]
+
+        requirements, deal_cost, _ = steps[step]
+        remaining = list(state)
+        cost = 0
+        result = best_cost(step + 1, state)
+        # try applying this deal once more until it no longer fits
+        while all(remaining[pos] >= quantity
+                  for pos, quantity in requirements):
+            for pos, quantity in requirements:
+                remaining[pos] -= quantity
+            cost += deal_cost
+            result = min(result, cost + best_cost(step + 1, tuple(remaining)))
+
+        memo[key] = result
+        return result
+
+    return best_cost(0, tuple(counts[index] for index in group_skus))
+
+
+def solve_deals_exact(counts, ordered_deals, prices):
+    """
+    Finds the cheapest way of pricing the basket rather than greedily
+    applying the biggest saving first. Deals are split into groups that
+    share SKUs and each group is solved on its own, items outside every
+    group are just priced individually.
+    Args:
+        counts (list(int)): Occurrences of each item in basket
+        ordered_deals (tuple(Deal)): compiled deals
+        prices (tuple(int)): price of each item, in the same order
+    Returns:
+        (int): minimum total cost of basket
+    """
+    # only deals that save money and fit the basket at least once
+    deals = [
+        deal for deal in ordered_deals
+        if deal.saving > 0 and all(
+            counts[index] >= quantity
+            for index, quantity in deal.requirements)
+    ]
+
+    total_cost = 0
+    grouped = set()
+    for group_skus, group_deals in group_interacting_deals(deals):
+        total_cost += solve_group_exact(
+            counts, group_skus, group_deals, prices)
+        grouped.update(group_skus)
+
+    total_cost += sum(
+        quantity * prices[index] for index, quantity in enumerate(counts)
+        if index not in grouped
+    )
+    return total_cost
+
+
+# object with price(counts, catalog, exact) put in front of pricing by
+# price_basket, see checkout_cache.PriceCache
+_price_cache = None
+
+
+def set_price_cache(cache):
+    """
+    Puts cache in front of checkout pricing, None takes it away
+    Args:
+        cache: object with price(counts, catalog, exact) returning the
+            total of a counted basket, eg. a checkout_cache.PriceCache
+    """
+    global _price_cache
+    _price_cache = cache
+
+
+def price_counts(counts, catalog, exact=False):
+    """
+    Returns total cost of a basket already counted into a vector
+    Args:
+        counts (list(int)) - quantity of each catalog item, updated in
+            place as deals are applied
+        catalog (Catalog) - prices and deals to apply
+        exact (bool) - find the optimal combination of deals instead of
+            applying the biggest savings first
+    Returns:
+        Integer representing the total checkout value of the items
+    """
+    if stage_hooks:
+        # the same stages, each timed for the stage hooks
+        return (
+            timed('quantity_pricers', evaluate_quantity_pricers,
+                   counts, catalog.quantity_pricers) +
+            timed('components', evaluate_components,
+                   counts, catalog.components, catalog.prices, exact) +
+            timed('remaining_items', evaluate_remaining_items,
+                   counts, catalog.prices)
+        )
+
+    # items whose deals only involve themselves come from lookup tables
+    total_cost = evaluate_quantity_pricers(counts, catalog.quantity_pricers)
+    # each group of deals sharing items is priced on its own
+    total_cost += evaluate_components(
+        counts, catalog.components, catalog.prices, exact)
+
+    remaining_cost = evaluate_remaining_items(counts, catalog.prices)
+    total_cost += remaining_cost
+
+    return total_cost
+
+
+def price_basket(skus, catalog, exact=False):
+    """
+    Returns total cost of all items listed in `skus` using an already
+    compiled catalog
+    Args:
+        skus (string) - the SKUs of all the products in the basket
+        catalog (Catalog) - prices and deals to apply
+        exact (bool) - find the optimal combination of deals instead of
+            applying the biggest savings first
+    Returns:
+        Integer representing the total checkout value of the items, or
+        -1 if the basket contains an unknown item
+    """
+    if not skus:
+        return 0
+
+    if stage_hooks:
+        counts = timed('count_items', catalog.tokenizer.count, skus)
+    else:
+        counts = catalog.tokenizer.count(skus)
+    if counts is None:
+        return -1
+
+    cache = _price_cache
+    if cache is not None:
+        return cache.price(counts, catalog, exact)
+    return price_counts(counts, catalog, exact)
+
+
 # noinspection PyUnusedLocal
 # skus = unicode string
-def checkout(skus):
+def checkout(skus, exact=False):
     """
     Returns total cost of all items listed in `skus`
     Args:
         skus (string) - the SKUs of all the products in the basket
+        exact (bool) - use the optimal deal solver
     Returns:
         Integer representing the total checkout value of the items
     """
-    if not skus:
-        return 0
+    if stage_hooks:
+        start = clock()
+        total_cost = price_basket(skus, timed('catalog', get_catalog), exact)
+        report('checkout', clock() - start)
+        return total_cost
+    return price_basket(skus, get_catalog(), exact)
 
-    total_cost = 0
-    item_prices, item_deals = load_prices()
-    items_counter = Counter(skus)
 
-    ordered_deals = get_ordered_deals(item_prices, item_deals)
+def checkout_many(baskets, exact=False, catalog=None):
+    """
+    Prices a batch of baskets against a single catalog. Identical
+    baskets within the batch are only priced once, remembering up to
+    CHECKOUT_MANY_CACHE_SIZE of them at a time.
+    Args:
+        baskets (iterable(string)) - SKUs of each basket
+        exact (bool) - use the optimal deal solver
+        catalog (Catalog) - prices and deals to apply, defaults to the
+            process-wide catalog
+    Returns:
+        (list(int)): total for each basket in input order, -1 for
+            invalid baskets exactly like `checkout`
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    priced = {}
+    totals = []
+    for skus in baskets:
+        total = priced.get(skus)
+        if total is None:
+            if len(priced) >= CHECKOUT_MANY_CACHE_SIZE:
+                priced.clear()
+            total = priced[skus] = price_basket(skus, catalog, exact)
+        totals.append(total)
 
-    deals_cost, items_counter = evaluate_deals(items_counter, ordered_deals)
-    total_cost += deals_cost
+    return totals
 
-    remaining_cost = evaluate_remaining_items(
-        items_counter, item_prices
-    )
-    total_cost += remaining_cost
 
-    return total_cost
+def iter_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Reads a basket in pieces of about chunk_size SKUs. Small pieces
+    (eg. single characters from a generator) are joined so that each
+    chunk can be counted in one go.
+    Args:
+        source: file object with read(), or iterable of strings
+        chunk_size (int): number of SKUs to read or join at a time
+    Yields:
+        (str): pieces of the basket
+    """
+    read = getattr(source, 'read', None)
+    if read is not None:
+        source = iter(lambda: read(chunk_size), source.read(0))
+
+    pieces = []
+    buffered = 0
+    for piece in source:
+        if isinstance(piece, bytes) and not isinstance(piece, str):
+            # binary stream, bytes outside ASCII will not match any SKU
+            piece = piece.decode('latin-1')
+        pieces.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield ''.join(pieces)
+            pieces = []
+            buffered = 0
+
+    if pieces:
+        yield ''.join(pieces)
+
 
+def checkout_stream(source, exact=False):
+    """
+    Returns total cost of a basket read incrementally from `source`, so
+    the basket never has to be held in memory as a single string.
+    Reading stops at the first chunk containing an unknown item.
+    Args:
+        source: file object, iterator of chunks or generator of SKUs
+        exact (bool) - use the optimal deal solver
+    Returns:
+        Integer representing the total checkout value of the items, or
+        -1 if the basket contains an unknown item
+    """
+    catalog = get_catalog()
+    counts = [0] * len(catalog.skus)
+    # end of the previous chunk that could be the start of a longer SKU
+    tail = ''
+    for chunk in iter_chunks(source):
+        chunk = tail + chunk
+        chunk_counts, position = catalog.tokenizer.count_prefix(chunk)
+        if chunk_counts is None:
+            return -1
+        counts = list(map(operator.add, counts, chunk_counts))
+        tail = chunk[position:]
+
+    if tail:
+        tail_counts = catalog.tokenizer.count(tail)
+        if tail_counts is None:
+            return -1
+        counts = list(map(operator.add, counts, tail_counts))
 
+    return price_counts(counts, catalog, exact)
@@ -0,0 +1,169 @@
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+import unittest
+
+try:
+    from runner import concurrent_runner
+    from tdl.queue.abstractions.request import Request
+    from tdl.queue.queue_based_implementation_runner import \
+        QueueBasedImplementationRunnerAudit
+except ImportError:
+    # needs tdl-client-python
+    concurrent_runner = None
+
+
+def unpicklable_result():
+    return lambda: None
+
+
+class QuietAuditStream(object):
+    @staticmethod
+    def log(value):
+        pass
+
+
+class FakeBroker(object):
+    """
+    Records what the dispatcher does with the connection
+    """
+
+    def __init__(self):
+        self.published = []
+        self.busy = []
+        self.stopped = False
+
+    def set_busy(self, busy):
+        self.busy.append(busy)
+
+    def respond_to(self, headers, response):
+        self.published.append((headers['message-id'], response.result))
+
+    def stop(self):
+        self.stopped = True
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@unittest.skipIf(concurrent_runner is None, "tdl is not installed")
+class TestOrderedDispatch(unittest.TestCase):
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.release = threading.Event()
+        self.pools = []
+        self.dispatches = []
+
+    def tearDown(self):
+        self.release.set()
+        for dispatch in self.dispatches:
+            dispatch.close()
+        for pool in self.pools:
+            pool.terminate()
+            pool.join()
+
+    def create_dispatch(self, solutions, pool, max_in_flight=4, **kwargs):
+        self.pools.append(pool)
+        dispatch = concurrent_runner.OrderedDispatch(
+            solutions, pool, max_in_flight,
+            QueueBasedImplementationRunnerAudit(QuietAuditStream), **kwargs)
+        self.dispatches.append(dispatch)
+        return dispatch
+
+    def send(self, dispatch, message_id, method, *params):
+        dispatch.process_next_request_from(
+            self.broker, {'message-id': message_id},
+            Request(method, list(params), message_id))
+
+    def send_in_thread(self, dispatch, message_id, method, *params):
+        thread = threading.Thread(
+            target=self.send, args=(dispatch, message_id, method) + params)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_responses_published_in_request_order(self):
+        def slow(value):
+            self.release.wait(5)
+            return value
+
+        dispatch = self.create_dispatch(
+            {'slow': slow, 'echo': lambda value: value}, ThreadPool(3))
+        self.send(dispatch, '1', 'slow', 'a')
+        self.send(dispatch, '2', 'echo', 'b')
+        self.send(dispatch, '3', 'echo', 'c')
+
+        # later requests finish first and wait in the reorder buffer
+        self.assertTrue(wait_until(lambda: len(dispatch._completed) == 2))
+        self.assertEqual(self.broker.published, [])
+        self.release.set()
+        self.assertTrue(wait_until(lambda: len(self.broker.published) == 3))
+        self.assertEqual(
+            self.broker.published, [('1', 'a'), ('2', 'b'), ('3', 'c')])
+        self.assertEqual(self.broker.busy, [True, False])
+
+    def test_window_released_after_error(self):
+        def fail():
+            raise ValueError('broken')
+
+        dispatch = self.create_dispatch(
+            {'fail': fail, 'echo': lambda value: value}, ThreadPool(1),
+            max_in_flight=1)
+        self.send(dispatch, '1', 'fail')
+        # the window holds one request, this only returns once the
+        # failed one gave its place back
+        sender = self.send_in_thread(dispatch, '2', 'echo', 'b')
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+        self.assertTrue(wait_until(lambda: self.broker.busy[-1] is False))
+        self.assertTrue(self.broker.stopped)
+        # nothing is published after a fatal error
+        self.assertEqual(self.broker.published, [])
+
+    def assert_request_fails(self, dispatch, method, *params):
+        self.send(dispatch, '1', method, *params)
+        self.assertTrue(wait_until(lambda: self.broker.stopped))
+        self.assertTrue(wait_until(lambda: self.broker.busy[-1] is False))
+        self.assertEqual(self.broker.published, [])
+        self.assertEqual(dispatch._running, {})
+        # the window is free again
+        self.assertTrue(dispatch._window.acquire(False))
+
+    def test_unpicklable_solution_fails_request(self):
+        dispatch = self.create_dispatch(
+            {'lambda': lambda: 'OK'}, multiprocessing.Pool(1),
+            max_in_flight=1)
+        self.assert_request_fails(dispatch, 'lambda')
+
+    def test_unpicklable_result_fails_request(self):
+        dispatch = self.create_dispatch(
+            {'result': unpicklable_result}, multiprocessing.Pool(1),
+            max_in_flight=1)
+        self.assert_request_fails(dispatch, 'result')
+
+    def test_solution_timeout_fails_request(self):
+        dispatch = self.create_dispatch(
+            {'hang': lambda: self.release.wait(5)}, ThreadPool(1),
+            max_in_flight=1, timeout=0.1)
+        self.assert_request_fails(dispatch, 'hang')
+
+    def test_late_result_after_timeout_is_ignored(self):
+        dispatch = self.create_dispatch(
+            {'hang': lambda: self.release.wait(5),
+             'echo': lambda value: value},
+            ThreadPool(2), timeout=0.1)
+        self.send(dispatch, '1', 'hang')
+        self.assertTrue(wait_until(lambda: self.broker.stopped))
+        self.release.set()
+        self.send(dispatch, '2', 'echo', 'b')
+        self.assertTrue(wait_until(
+            lambda: self.broker.busy.count(False) == 2))
+        self.assertEqual(dispatch._next_to_publish, 2)
+        self.assertEqual(self.broker.published, [])
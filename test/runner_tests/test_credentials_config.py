@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from runner.credentials_config_file import CredentialsConfig, parse_value
+
+
+class TestCredentialsConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'credentials.config')
+        self.write_config(
+            '# comment\n'
+            'tdl_hostname=file-host\n'
+            'tdl_journey_id="abc\\=\\="\n'
+            'tdl_require_rec=false\n'
+            'tdl_use_coloured_output=maybe\n'
+            'tdl_runner_workers=4\n'
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_config(self, content):
+        with open(self.path, 'w') as config_file:
+            config_file.write(content)
+
+    def test_parse_value(self):
+        self.assertEqual(parse_value(' "a\\=b" '), 'a=b')
+        self.assertIs(parse_value('true'), True)
+        self.assertIs(parse_value('false'), False)
+        self.assertEqual(parse_value('True'), 'True')
+
+    def test_get(self):
+        config = CredentialsConfig(self.path, environ={})
+        self.assertEqual(config.get('tdl_hostname'), 'file-host')
+        self.assertEqual(config.get('tdl_journey_id'), 'abc==')
+        self.assertEqual(config.get('missing', 'default'), 'default')
+        self.assertIsNone(config.get('missing', None))
+        with self.assertRaises(KeyError):
+            config.get('missing')
+
+    def test_environment_overrides_file(self):
+        config = CredentialsConfig(self.path, environ={
+            'TDL_HOSTNAME': 'env-host',
+            'TDL_REQUIRE_REC': 'true',
+            'TDL_NEW_KEY': '"quoted"',
+            # only the upper case name overrides
+            'tdl_runner_workers': '8',
+        })
+        self.assertEqual(config.get('tdl_hostname'), 'env-host')
+        self.assertIs(config.get_bool('tdl_require_rec'), True)
+        self.assertEqual(config.get('tdl_new_key'), 'quoted')
+        self.assertEqual(config.get_int('tdl_runner_workers'), 4)
+
+    def test_typed_accessors(self):
+        config = CredentialsConfig(self.path, environ={})
+        self.assertEqual(config.get_int('tdl_runner_workers'), 4)
+        self.assertEqual(config.get_int('missing', 1), 1)
+        self.assertIs(config.get_bool('tdl_require_rec'), False)
+        self.assertIs(config.get_bool('missing', True), True)
+        with self.assertRaises(ValueError):
+            config.get_bool('tdl_use_coloured_output')
+        self.assertEqual(config.get_str('tdl_require_rec'), 'False')
+        self.assertIsNone(config.get_str('missing', None))
+        with self.assertRaises(ValueError):
+            config.get_int('tdl_hostname')
+
+    def test_get_bool_from_environment(self):
+        for value, expected in (
+            ('False', False), ('0', False), ('no', False), (' NO ', False),
+            ('TRUE', True), ('1', True), ('yes', True), ('"Yes"', True),
+        ):
+            config = CredentialsConfig(
+                self.path, environ={'TDL_REQUIRE_REC': value})
+            self.assertIs(config.get_bool('tdl_require_rec'), expected)
+
+        config = CredentialsConfig(
+            self.path, environ={'TDL_REQUIRE_REC': 'off'})
+        with self.assertRaises(ValueError):
+            config.get_bool('tdl_require_rec')
+
+    def test_parsed_once(self):
+        config = CredentialsConfig(self.path, environ={})
+        properties = config.properties()
+        self.write_config('tdl_hostname=changed-host\n')
+        self.assertIs(config.properties(), properties)
+        self.assertEqual(config.get('tdl_hostname'), 'file-host')
+
+        self.assertEqual(config.reload()['tdl_hostname'], 'changed-host')
+        self.assertEqual(config.get('tdl_hostname'), 'changed-host')
+
+    def test_reload_interval(self):
+        config = CredentialsConfig(self.path, environ={}, reload_interval=0)
+        properties = config.properties()
+        # unchanged file, not parsed again
+        self.assertIs(config.properties(), properties)
+
+        self.write_config('tdl_hostname=changed-host\ntdl_runner_workers=2\n')
+        self.assertEqual(config.get('tdl_hostname'), 'changed-host')
+        self.assertEqual(config.get_int('tdl_runner_workers'), 2)
+
+    def test_reload_keeps_properties_when_file_is_gone(self):
+        config = CredentialsConfig(self.path, environ={}, reload_interval=0)
+        self.assertEqual(config.get('tdl_hostname'), 'file-host')
+        os.remove(self.path)
+        self.assertEqual(config.get('tdl_hostname'), 'file-host')
+        self.assertEqual(config.reload()['tdl_hostname'], 'file-host')
+
+        # picked up again once the file is back
+        self.write_config('tdl_hostname=changed-host\n')
+        self.assertEqual(config.get('tdl_hostname'), 'changed-host')
+
+    def test_reload_interval_not_elapsed(self):
+        config = CredentialsConfig(
+            self.path, environ={}, reload_interval=3600)
+        config.properties()
+        self.write_config('tdl_hostname=changed-host\n')
+        self.assertEqual(config.get('tdl_hostname'), 'file-host')
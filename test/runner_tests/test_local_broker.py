@@ -0,0 +1,153 @@
+import socket
+import threading
+import time
+import unittest
+
+from runner.local_broker import LocalBroker, decode_frames, encode_frame
+
+
+class TestFrames(unittest.TestCase):
+    def test_decode_frame(self):
+        frames, rest = decode_frames(
+            b'SEND\ndestination:q\nreceipt:1\n\nhello\x00')
+        self.assertEqual(
+            frames, [('SEND', {'destination': 'q', 'receipt': '1'}, b'hello')])
+        self.assertEqual(rest, b'')
+
+    def test_decode_partial_frames(self):
+        data = encode_frame('SEND', {'destination': 'q'}, b'one') + \
+            encode_frame('SEND', {'destination': 'q'}, b'two')
+        received = []
+        buffer = b''
+        # one byte at a time, frames only come out once complete
+        for position in range(len(data)):
+            frames, buffer = decode_frames(buffer + data[position:position + 1])
+            received.extend(body for _, _, body in frames)
+        self.assertEqual(received, [b'one', b'two'])
+        self.assertEqual(buffer, b'')
+
+    def test_decode_incomplete_frame_is_kept(self):
+        data = b'SEND\ndestination:q\n\nhel'
+        self.assertEqual(decode_frames(data), ([], data))
+        self.assertEqual(decode_frames(b'SEND\ndesti'), ([], b'SEND\ndesti'))
+
+    def test_decode_content_length_body_with_nul(self):
+        body = b'a\x00b'
+        data = encode_frame('SEND', {'content-length': len(body)}, body)
+        frames, rest = decode_frames(data[:-1])
+        self.assertEqual((frames, rest), ([], data[:-1]))
+        # a heart-beat after the frame is dropped
+        frames, rest = decode_frames(data + b'\n')
+        self.assertEqual(frames[0][2], body)
+        self.assertEqual(rest, b'')
+
+    def test_decode_heart_beats_and_crlf(self):
+        frames, rest = decode_frames(
+            b'\n\r\nACK\r\nid:7\r\n\n\x00\nAC')
+        self.assertEqual(frames, [('ACK', {'id': '7'}, b'')])
+        self.assertEqual(rest, b'AC')
+
+    def test_decode_headers(self):
+        frames, _ = decode_frames(
+            b'SEND\nkey:a\\cb\\nc\\\\\nrepeated:1\nrepeated:2\n'
+            b'no-value\n\n\x00')
+        self.assertEqual(frames[0][1], {
+            'key': 'a:b\nc\\', 'repeated': '1', 'no-value': ''})
+        # CONNECT headers are not escaped
+        frames, _ = decode_frames(b'CONNECT\nlogin:a\\cb\n\n\x00')
+        self.assertEqual(frames[0][1], {'login': 'a\\cb'})
+
+    def test_encode_round_trip(self):
+        headers = {'destination': 'a:b\nc', 'content-length': 3}
+        frames, _ = decode_frames(encode_frame('MESSAGE', headers, b'x\x00y'))
+        self.assertEqual(frames, [('MESSAGE', {
+            'destination': 'a:b\nc', 'content-length': '3'}, b'x\x00y')])
+
+
+class TestLocalBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = LocalBroker()
+        self.broker.start()
+        self.buffer = b''
+        self.frames = []
+
+    def tearDown(self):
+        self.broker.stop()
+
+    def connect(self):
+        client = socket.create_connection(('127.0.0.1', self.broker.port))
+        client.settimeout(5)
+        client.sendall(encode_frame('CONNECT', {'accept-version': '1.1'}))
+        self.assertEqual(self.receive(client)[0], 'CONNECTED')
+        return client
+
+    def receive(self, client):
+        while not self.frames:
+            self.buffer += client.recv(65536)
+            self.frames, self.buffer = decode_frames(self.buffer)
+        return self.frames.pop(0)
+
+    def test_enqueue_wakes_waiter(self):
+        def enqueue_later():
+            time.sleep(0.05)
+            self.broker.enqueue('out', 'done')
+
+        thread = threading.Thread(target=enqueue_later)
+        thread.start()
+        start = time.time()
+        self.assertTrue(self.broker.wait_for_messages('out', 1, timeout=5))
+        # woken by enqueue, not by the timeout
+        self.assertLess(time.time() - start, 2)
+        thread.join()
+        self.assertEqual(
+            [message.body for message in self.broker.messages('out')],
+            [b'done'])
+
+    def test_delivers_in_order_within_prefetch(self):
+        client = self.connect()
+        client.sendall(encode_frame('SUBSCRIBE', {
+            'destination': 'in', 'id': '1', 'ack': 'client-individual',
+            'activemq.prefetchSize': 2}))
+        for body in ('a', 'b', 'c'):
+            self.broker.enqueue('in', body)
+
+        first = self.receive(client)
+        second = self.receive(client)
+        self.assertEqual((first[2], second[2]), (b'a', b'b'))
+        self.assertEqual(self.broker.pending('in'), 3)
+
+        # acknowledging one makes room for the next
+        client.sendall(encode_frame('ACK', {
+            'subscription': '1', 'message-id': first[1]['message-id']}))
+        self.assertEqual(self.receive(client)[2], b'c')
+        client.close()
+
+    def test_slow_consumer_does_not_block_producers(self):
+        consumer = self.connect()
+        consumer.sendall(encode_frame('SUBSCRIBE', {
+            'destination': 'in', 'id': '1', 'receipt': 'subscribed'}))
+        self.assertEqual(self.receive(consumer)[0], 'RECEIPT')
+
+        # the consumer stops reading, fill its socket until a delivery
+        # to it blocks
+        body = b'x' * 65536
+        for _ in range(10000):
+            blocked = threading.Thread(
+                target=self.broker.enqueue, args=('in', body))
+            blocked.daemon = True
+            blocked.start()
+            blocked.join(0.5)
+            if blocked.is_alive():
+                break
+        else:
+            self.fail('consumer socket never filled up')
+
+        producer = threading.Thread(
+            target=self.broker.enqueue, args=('out', 'ok'))
+        producer.daemon = True
+        producer.start()
+        producer.join(5)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(len(self.broker.messages('out')), 1)
+        consumer.close()
+        blocked.join(5)
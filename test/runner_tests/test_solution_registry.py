@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+import uuid
+
+from runner import solution_registry
+from runner.solution_registry import LazySolution, warm_up
+
+SOLUTION_MODULE = '''
+warm_ups = 0
+
+
+def double(value):
+    return value * 2
+
+
+def prepare():
+    global warm_ups
+    warm_ups += 1
+'''
+
+
+def warm_up_count(module_name):
+    return sys.modules[module_name].warm_ups
+
+
+class TestLazySolution(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.module_name = 'lazy_solution_%s' % uuid.uuid4().hex
+        with open(os.path.join(self.tmp_dir, self.module_name + '.py'),
+                  'w') as module_file:
+            module_file.write(SOLUTION_MODULE)
+        sys.path.insert(0, self.tmp_dir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp_dir)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.tmp_dir)
+
+    def create_solution(self):
+        return LazySolution(self.module_name + ':double',
+                            warm_up=self.module_name + ':prepare')
+
+    def test_imported_on_first_call(self):
+        solution = self.create_solution()
+        self.assertNotIn(self.module_name, sys.modules)
+        self.assertEqual(solution(21), 42)
+        self.assertIn(self.module_name, sys.modules)
+        self.assertEqual(warm_up_count(self.module_name), 1)
+
+    def test_warm_up_runs_once(self):
+        solution = self.create_solution()
+        warm_up([solution, len])
+        thread = warm_up([solution, self.create_solution()], background=True)
+        thread.join(5)
+        solution(1)
+        self.create_solution()(1)
+        self.assertEqual(warm_up_count(self.module_name), 1)
+
+    def test_unpickled_copies_share_loaded_solution(self):
+        solution = self.create_solution()
+        copy = pickle.loads(pickle.dumps(solution))
+        self.assertEqual(repr(copy), repr(solution))
+        self.assertNotIn(self.module_name, sys.modules)
+
+        self.assertEqual(copy(2), 4)
+        self.assertEqual(solution(3), 6)
+        self.assertEqual(pickle.loads(pickle.dumps(solution))(4), 8)
+        self.assertEqual(warm_up_count(self.module_name), 1)
+        self.assertIs(
+            solution_registry._loaded[self.module_name + ':double'],
+            sys.modules[self.module_name].double)
+
+    def test_pool_worker_warms_up_once(self):
+        solution = self.create_solution()
+        pool = multiprocessing.Pool(1)
+        try:
+            results = [pool.apply_async(solution, (value,))
+                       for value in range(5)]
+            self.assertEqual([result.get(10) for result in results],
+                             [0, 2, 4, 6, 8])
+            self.assertEqual(
+                pool.apply(warm_up_count, (self.module_name,)), 1)
+        finally:
+            pool.terminate()
+            pool.join()
+        # the parent never needed it
+        self.assertNotIn(self.module_name, sys.modules)
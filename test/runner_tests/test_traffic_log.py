@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from runner.traffic_log import (
+    TrafficRecorder, read_traffic, record_solutions, replay)
+
+
+def echo(value):
+    return value
+
+
+def add(x, y):
+    return x + y
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+SOLUTIONS = (('echo', echo), ('add', add), ('fail', fail))
+
+
+class TestTrafficLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'traffic.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def record_session(self):
+        recorder = TrafficRecorder(self.path)
+        solutions = dict(record_solutions(SOLUTIONS, recorder))
+        self.assertEqual(solutions['add'](1, 2), 3)
+        self.assertEqual(solutions['echo']({'a': [1, 'b']}), {'a': [1, 'b']})
+        with self.assertRaises(ValueError):
+            solutions['fail']('broken')
+        self.assertEqual(solutions['echo']('last'), 'last')
+        recorder.record('add', [2, 2], 4, request_id='req-5')
+        recorder.close()
+        return read_traffic(self.path)
+
+    def test_record_solutions_without_recorder(self):
+        self.assertIs(record_solutions(SOLUTIONS, None), SOLUTIONS)
+
+    def test_round_trip_keeps_order(self):
+        entries = self.record_session()
+        self.assertEqual(
+            [(entry['method'], entry['params']) for entry in entries],
+            [('add', [1, 2]), ('echo', [{'a': [1, 'b']}]),
+             ('fail', ['broken']), ('echo', ['last']), ('add', [2, 2])])
+        self.assertEqual(entries[0]['result'], 3)
+        self.assertEqual(entries[1]['result'], {'a': [1, 'b']})
+        self.assertEqual(entries[2]['error'], 'broken')
+        self.assertNotIn('result', entries[2])
+        self.assertTrue(all('ms' in entry for entry in entries[:4]))
+        self.assertEqual(entries[4], {
+            'method': 'add', 'params': [2, 2], 'result': 4, 'id': 'req-5'})
+
+    def test_recorder_appends(self):
+        self.record_session()
+        recorder = TrafficRecorder(self.path)
+        recorder.record('echo', ['more'], 'more')
+        recorder.close()
+        entries = read_traffic(self.path)
+        self.assertEqual(len(entries), 6)
+        self.assertEqual(entries[-1]['params'], ['more'])
+
+    def test_replay_matching_solutions(self):
+        entries = self.record_session()
+        summary, mismatches = replay(entries, dict(SOLUTIONS), repeat=3)
+        self.assertEqual(mismatches, [])
+        self.assertEqual(summary['requests'], 15)
+        self.assertEqual(summary['methods']['add']['requests'], 6)
+        self.assertEqual(summary['methods']['fail']['requests'], 3)
+        # per method rates share the replay's wall time
+        self.assertAlmostEqual(
+            sum(method['requests_per_second']
+                for method in summary['methods'].values()),
+            summary['requests_per_second'])
+
+    def test_replay_reports_diverging_solution(self):
+        entries = self.record_session()
+        solutions = dict(SOLUTIONS)
+        solutions['add'] = lambda x, y: x * y
+        _, mismatches = replay(entries, solutions)
+        # 2 + 2 == 2 * 2, only the first call diverges
+        self.assertEqual(mismatches, [(entries[0], 2)])
+
+    def test_replay_reports_unserialisable_result(self):
+        entries = self.record_session()
+        solutions = dict(SOLUTIONS)
+        solutions['echo'] = lambda value: object()
+        _, mismatches = replay(entries, solutions)
+        self.assertEqual(
+            [entry for entry, _ in mismatches], [entries[1], entries[3]])
+
+    def test_replay_reports_changed_errors(self):
+        entries = self.record_session()
+        solutions = dict(SOLUTIONS)
+        solutions['fail'] = echo
+        del solutions['echo']
+        _, mismatches = replay(entries, solutions)
+        self.assertEqual(
+            [entry['method'] for entry, _ in mismatches],
+            ['echo', 'fail', 'echo'])
+        self.assertIsInstance(mismatches[0][1], KeyError)
+        self.assertEqual(mismatches[1][1], 'broken')
@@ -1,7 +1,14 @@
 from collections import Counter
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
-from solutions.CHK import checkout_solution
+from solutions.CHK import checkout_instrumentation, checkout_solution
 
 
 class TestLoadPrices(unittest.TestCase):
@@ -11,6 +18,150 @@ class TestLoadPrices(unittest.TestCase):
         self.assertEqual(len(deals), 15)
 
 
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'prices.csv')
+        with open(self.path, 'w') as prices_file:
+            prices_file.write('A;50;3A for 130\nB;30;\n')
+        self.check_interval = checkout_solution.CATALOG_CHECK_INTERVAL
+
+    def tearDown(self):
+        checkout_solution.CATALOG_CHECK_INTERVAL = self.check_interval
+        checkout_solution.invalidate_catalog()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compile_catalog(self):
+        catalog = checkout_solution.compile_catalog(self.path)
+        self.assertEqual(catalog.item_prices, {'A': 50, 'B': 30})
+        self.assertEqual(catalog.item_deals, set(['3A for 130']))
+        self.assertEqual(catalog.skus, ('A', 'B'))
+        self.assertEqual(catalog.prices, (50, 30))
+        self.assertEqual(
+            catalog.ordered_deals,
+            (('3A for 130', ((0, 3),), 20, 130),),
+        )
+
+    def test_get_catalog_reused(self):
+        catalog = checkout_solution.get_catalog(self.path)
+        self.assertIs(checkout_solution.get_catalog(self.path), catalog)
+
+    def test_get_catalog_reloads_on_change(self):
+        checkout_solution.CATALOG_CHECK_INTERVAL = 0
+        catalog = checkout_solution.get_catalog(self.path)
+        self.assertIs(checkout_solution.get_catalog(self.path), catalog)
+
+        with open(self.path, 'a') as prices_file:
+            prices_file.write('C;20;\n')
+        reloaded = checkout_solution.get_catalog(self.path)
+        self.assertIsNot(reloaded, catalog)
+        self.assertEqual(reloaded.item_prices['C'], 20)
+
+
+class TestCatalogManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'prices.csv')
+        self.write_prices('A;50;3A for 130\n')
+        self.manager = checkout_solution.CatalogManager(self.path)
+
+    def tearDown(self):
+        self.manager.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_prices(self, content):
+        # replace the file atomically, like a deploy would
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as prices_file:
+            prices_file.write(content)
+        os.rename(tmp_path, self.path)
+
+    def wait_for_generation(self, generation):
+        deadline = time.time() + 5
+        while self.manager.generation < generation and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.generation, generation)
+
+    def test_reload(self):
+        catalog = self.manager.current()
+        self.assertEqual(self.manager.generation, 1)
+        self.assertEqual(self.manager.version, catalog.version)
+        self.assertIsNotNone(self.manager.last_reload_seconds)
+        self.assertFalse(self.manager.check())
+
+        self.write_prices('A;60;\nB;30;\n')
+        self.assertTrue(self.manager.check())
+        self.assertEqual(self.manager.current().item_prices['A'], 60)
+        # a checkout holding the old catalog still prices with it
+        self.assertEqual(checkout_solution.price_basket("AAA", catalog), 130)
+
+    def test_watcher_swaps_catalog(self):
+        self.manager.start(poll_interval=0.01)
+        catalog = self.manager.current()
+
+        self.write_prices('A;60;\nB;30;\n')
+        self.wait_for_generation(2)
+        self.assertIsNot(self.manager.current(), catalog)
+        self.assertEqual(
+            checkout_solution.price_basket("AB", self.manager.current()), 90)
+
+    def test_watcher_compiles_off_the_request_path(self):
+        compiled_on = []
+
+        def hook(stage, seconds):
+            if stage == 'compile_catalog':
+                compiled_on.append(threading.current_thread().name)
+
+        check_interval = checkout_solution.CATALOG_CHECK_INTERVAL
+        # without the watcher every request would check the file
+        checkout_solution.CATALOG_CHECK_INTERVAL = 0
+        checkout_instrumentation.add_stage_hook(hook)
+        manager = checkout_solution.start_catalog_watcher(
+            self.path, poll_interval=0.01)
+        # tearDown stops it
+        self.manager = manager
+        try:
+            catalog = checkout_solution.get_catalog(self.path)
+            self.write_prices('A;60;\n')
+            self.wait_for_generation(2)
+            self.assertIsNot(checkout_solution.get_catalog(self.path), catalog)
+            self.assertEqual(
+                checkout_solution.price_basket(
+                    "AAA", checkout_solution.get_catalog(self.path)), 180)
+        finally:
+            checkout_instrumentation.remove_stage_hook(hook)
+            checkout_solution.CATALOG_CHECK_INTERVAL = check_interval
+        # the first compile happens when the watcher starts, the reload
+        # on the watcher thread
+        self.assertEqual(compiled_on, [
+            threading.current_thread().name, 'catalog-watcher'])
+
+    def test_failed_reload_keeps_catalog(self):
+        catalog = self.manager.current()
+        self.write_prices('A;not a price;\n')
+        self.assertFalse(self.manager.check())
+        self.assertIs(self.manager.current(), catalog)
+        self.assertIsInstance(self.manager.last_error, ValueError)
+
+    def test_failed_file_not_compiled_again(self):
+        catalog = self.manager.current()
+        self.write_prices('A;not a price;\n')
+        self.assertFalse(self.manager.check())
+        error = self.manager.last_error
+        self.assertEqual(
+            self.manager.failed_version,
+            checkout_solution.file_version(self.path))
+        # same broken file, no new attempt
+        self.assertFalse(self.manager.check())
+        self.assertIs(self.manager.last_error, error)
+
+        self.write_prices('A;60;\n')
+        self.assertTrue(self.manager.check())
+        self.assertIsNot(self.manager.current(), catalog)
+        self.assertIsNone(self.manager.failed_version)
+        self.assertIsNone(self.manager.last_error)
+
+
 class TestParseDealCode(unittest.TestCase):
     def test_parse_deal_code(self):
         self.assertEqual(checkout_solution.parse_deal_code("A"), (1, "A"))
@@ -21,6 +172,21 @@ class TestParseDealCode(unittest.TestCase):
             "3A3"), (None, None)
         )
 
+    def test_parse_deal_code_known_skus(self):
+        skus = set(['A', 'A3', 'AB12', '2A'])
+        self.assertEqual(
+            checkout_solution.parse_deal_code("3A3", skus), (3, "A3"))
+        self.assertEqual(
+            checkout_solution.parse_deal_code("AB12", skus), (1, "AB12"))
+        self.assertEqual(
+            checkout_solution.parse_deal_code("10AB12", skus), (10, "AB12"))
+        self.assertEqual(
+            checkout_solution.parse_deal_code("32A", skus), (32, "A"))
+        self.assertEqual(
+            checkout_solution.parse_deal_code("2A", skus), (2, "A"))
+        self.assertEqual(
+            checkout_solution.parse_deal_code("3B", skus), (None, None))
+
 
 class TestAggregateRequirements(unittest.TestCase):
     def test_aggregate_requirements(self):
@@ -80,6 +246,295 @@ class TestDealInfo(unittest.TestCase):
         self.assertEqual(deal_price, None)
 
 
+class TestCompileDeals(unittest.TestCase):
+    def test_compile_deals(self):
+        item_prices = {'A': 50, 'B': 30, 'E': 40}
+        item_deals = set(['2E get one B free', '3A for 130', '2B for 45'])
+        sku_index = {'A': 0, 'B': 1, 'E': 2}
+
+        deals = checkout_solution.compile_deals(
+            item_prices, item_deals, sku_index)
+        self.assertEqual(deals, (
+            ('2E get one B free', ((1, 1), (2, 2)), 30, 80),
+            ('3A for 130', ((0, 3),), 20, 130),
+            ('2B for 45', ((1, 2),), 15, 45),
+        ))
+        self.assertEqual(deals[0].cost, 80)
+
+    def test_check_deal(self):
+        item_prices = {'A': 50, 'B': 30}
+        self.assertIsNone(checkout_solution.check_deal('3A for 130', item_prices))
+        self.assertIsNone(
+            checkout_solution.check_deal('2A get one B free', item_prices))
+        for deal in ('3Z for 130', '3A for lots', '0A for 10',
+                     '2A get one Z free', '3A off'):
+            self.assertIsNotNone(
+                checkout_solution.check_deal(deal, item_prices), deal)
+
+    def test_compile_deals_rejects_invalid(self):
+        item_prices = {'A': 50, 'B': 30}
+        with self.assertRaises(ValueError) as context:
+            checkout_solution.compile_deals(
+                item_prices, set(['3A for 130', '3Z for 130', '0B for 10']),
+                {'A': 0, 'B': 1})
+        # every invalid deal is reported at once
+        self.assertIn('3Z for 130', str(context.exception))
+        self.assertIn('0B for 10', str(context.exception))
+
+
+class TestQuantityPricer(unittest.TestCase):
+    @staticmethod
+    def brute_force_price(quantity, unit_price, offers):
+        best = [0]
+        for n in range(1, quantity + 1):
+            best.append(min(
+                [best[n - 1] + unit_price] +
+                [best[n - q] + cost for q, cost in offers if q <= n]
+            ))
+        return best[quantity]
+
+    def test_price(self):
+        pricer = checkout_solution.QuantityPricer(50, [(3, 130), (5, 200)])
+        self.assertEqual(pricer.price(0), 0)
+        self.assertEqual(pricer.price(1), 50)
+        self.assertEqual(pricer.price(8), 330)
+        self.assertEqual(pricer.price(1003), 40130)
+
+    def test_price_matches_brute_force(self):
+        unit_price, offers = 10, [(7, 60), (4, 36), (9, 82)]
+        pricer = checkout_solution.QuantityPricer(unit_price, offers)
+        for quantity in range(300):
+            self.assertEqual(
+                pricer.price(quantity),
+                self.brute_force_price(quantity, unit_price, offers),
+            )
+
+    def test_table_limit(self):
+        # the cheapest per item offer is 997, any quantity up to
+        # 997 * 1000 can need the other offers
+        with self.assertRaises(ValueError):
+            checkout_solution.QuantityPricer(5, [(997, 3000), (1000, 3050)])
+
+        unit_price, offers = 5, [(97, 300), (100, 350)]
+        limit = checkout_solution.QUANTITY_TABLE_LIMIT
+        checkout_solution.QUANTITY_TABLE_LIMIT = 97 * 100
+        try:
+            pricer = checkout_solution.QuantityPricer(unit_price, offers)
+            checkout_solution.QUANTITY_TABLE_LIMIT -= 1
+            self.assertRaises(
+                ValueError, checkout_solution.QuantityPricer,
+                unit_price, offers)
+        finally:
+            checkout_solution.QUANTITY_TABLE_LIMIT = limit
+        for quantity in (0, 96, 197, 9699, 9700, 9701, 20003):
+            self.assertEqual(
+                pricer.price(quantity),
+                self.brute_force_price(quantity, unit_price, offers),
+            )
+
+    def test_compile_rejects_large_table(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'prices.csv')
+            with open(path, 'w') as prices_file:
+                prices_file.write('A;5;997A for 3000, 1000A for 3050\nB;1;\n')
+            with self.assertRaises(ValueError) as context:
+                checkout_solution.compile_catalog(path)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertIn("'997A for 3000'", str(context.exception))
+        self.assertIn('QUANTITY_TABLE_LIMIT', str(context.exception))
+
+    def test_compile_quantity_pricers(self):
+        ordered_deals = (
+            checkout_solution.Deal("2E get one B free", ((0, 1), (2, 2)), 30, 80),
+            checkout_solution.Deal("5A for 200", ((1, 5),), 50, 200),
+            checkout_solution.Deal("2B for 45", ((0, 2),), 15, 45),
+        )
+        pricers, deals = checkout_solution.compile_quantity_pricers(
+            ordered_deals, (30, 50, 40))
+        self.assertEqual([index for index, _ in pricers], [1])
+        self.assertEqual(pricers[0][1].price(6), 250)
+        self.assertEqual(deals, (ordered_deals[0], ordered_deals[2]))
+
+    def test_matches_deal_loop(self):
+        catalog = checkout_solution.get_catalog()
+        for index, pricer in catalog.quantity_pricers:
+            for quantity in range(60):
+                counts = [0] * len(catalog.skus)
+                counts[index] = quantity
+                deals_cost, counts = checkout_solution.evaluate_deals(
+                    counts, catalog.ordered_deals)
+                self.assertEqual(
+                    pricer.price(quantity),
+                    deals_cost + counts[index] * catalog.prices[index],
+                )
+
+
+class TestDealIndex(unittest.TestCase):
+    ordered_deals = (
+        checkout_solution.Deal("2E get one B free", ((1, 1), (4, 2)), 30, 80),
+        checkout_solution.Deal("3R get one Q free", ((2, 1), (3, 3)), 30, 150),
+        checkout_solution.Deal("2B for 45", ((1, 2),), 15, 45),
+        checkout_solution.Deal("3Q for 80", ((2, 3),), 10, 80),
+    )
+
+    def test_deal_index(self):
+        deal_index = checkout_solution.DealIndex(self.ordered_deals)
+        self.assertEqual(deal_index.masks, (0b10010, 0b01100, 0b10, 0b100))
+        self.assertEqual(deal_index.by_sku, {1: (0, 2), 2: (1, 3)})
+
+    def test_candidates(self):
+        deal_index = checkout_solution.DealIndex(self.ordered_deals)
+        self.assertEqual(
+            deal_index.candidates([0, 2, 0, 0, 1]),
+            [self.ordered_deals[0], self.ordered_deals[2]],
+        )
+        self.assertEqual(
+            deal_index.candidates([1, 1, 1, 0, 0]),
+            [self.ordered_deals[2], self.ordered_deals[3]],
+        )
+        self.assertEqual(deal_index.candidates([5, 0, 0, 0, 0]), [])
+
+
+class TestComponents(unittest.TestCase):
+    def test_catalog_components(self):
+        catalog = checkout_solution.get_catalog()
+        components = [
+            ''.join(catalog.skus[index] for index in component.skus)
+            for component in catalog.components
+        ]
+        self.assertEqual(sorted(components), ['BE', 'MN', 'QR'])
+        self.assertIs(
+            catalog.component_of[catalog.sku_index['E']],
+            catalog.component_of[catalog.sku_index['B']],
+        )
+
+    def test_component_price(self):
+        deals = (
+            checkout_solution.Deal("2E get one B free", ((0, 1), (1, 2)), 30, 80),
+            checkout_solution.Deal("3B for 69", ((0, 3),), 21, 69),
+            checkout_solution.Deal("3E for 100", ((1, 3),), 20, 100),
+        )
+        component = checkout_solution.Component((0, 1), deals)
+        prices = (30, 40, 10)
+        self.assertEqual(component.price([3, 3, 7], prices), 180)
+        self.assertEqual(component.price([3, 3, 7], prices, exact=True), 169)
+        # cached result is keyed on the component's own items only
+        self.assertEqual(component.price([3, 3, 0], prices), 180)
+        self.assertEqual(len(component._cache), 2)
+
+    def test_component_price_matches_deal_loop(self):
+        catalog = checkout_solution.get_catalog()
+        rng = random.Random(0)
+        for component in catalog.components:
+            for _ in range(200):
+                counts = [0] * len(catalog.skus)
+                for index in component.skus:
+                    counts[index] = rng.randint(0, 12)
+                deals_cost, remaining = checkout_solution.evaluate_deals(
+                    list(counts), component.deals)
+                self.assertEqual(
+                    component.price(counts, catalog.prices),
+                    deals_cost + checkout_solution.evaluate_remaining_items(
+                        remaining, catalog.prices),
+                )
+
+    def test_evaluate_components(self):
+        catalog = checkout_solution.get_catalog()
+        counts = checkout_solution.count_items("EEBBBNNNMC", catalog.sku_index)
+        cost = checkout_solution.evaluate_components(
+            counts, catalog.components, catalog.prices)
+        self.assertEqual(cost, 80 + 45 + 120)
+        self.assertEqual(
+            [catalog.skus[index] for index, quantity in enumerate(counts)
+             if quantity],
+            ['C'],
+        )
+
+
+class TestSkuTokenizer(unittest.TestCase):
+    skus = ('A', 'AB', 'AB12', 'C')
+
+    def test_count(self):
+        tokenizer = checkout_solution.SkuTokenizer(self.skus)
+        self.assertEqual(tokenizer.max_length, 4)
+        self.assertEqual(tokenizer.count("AB12AB12ABCA"), [1, 1, 2, 1])
+        self.assertEqual(tokenizer.count(""), [0, 0, 0, 0])
+        self.assertEqual(tokenizer.count("AB1"), None)
+        self.assertEqual(tokenizer.count("ABX"), None)
+
+    def test_count_prefix(self):
+        tokenizer = checkout_solution.SkuTokenizer(self.skus)
+        # "AB" at the end could be the start of "AB12" in the next chunk
+        self.assertEqual(
+            tokenizer.count_prefix("CAB12AB"), ([0, 0, 1, 1], 5))
+        self.assertEqual(
+            tokenizer.count_prefix("CAB12AB", partial=False),
+            ([0, 1, 1, 1], 7))
+
+    def test_single_character_skus(self):
+        tokenizer = checkout_solution.SkuTokenizer(('A', 'B'))
+        self.assertEqual(tokenizer.max_length, 1)
+        self.assertEqual(tokenizer.count_prefix("ABB"), ([1, 2], 3))
+        self.assertEqual(tokenizer.count("AB-"), None)
+
+    def test_multi_character_catalog(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'prices.csv')
+            with open(path, 'w') as prices_file:
+                prices_file.write(
+                    'A;10;\nAB;20;AB get one C free\nAB12;30;2AB12 for 50\n'
+                    'C;5;\n')
+            catalog = checkout_solution.compile_catalog(path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        self.assertEqual(catalog.skus, ('A', 'AB', 'AB12', 'C'))
+        self.assertEqual(
+            checkout_solution.price_basket("AB12AB12ABCA", catalog),
+            50 + 20 + 10)
+        self.assertEqual(checkout_solution.price_basket("AB1", catalog), -1)
+
+
+class TestCountItems(unittest.TestCase):
+    def test_count_items(self):
+        sku_index = {'A': 0, 'B': 1, 'C': 2}
+        self.assertEqual(
+            checkout_solution.count_items("ABCAA", sku_index), [3, 1, 1])
+
+    def test_count_items_unknown_item(self):
+        sku_index = {'A': 0, 'B': 1}
+        self.assertEqual(
+            checkout_solution.count_items("ABx", sku_index), None)
+
+    def test_count_items_long_basket(self):
+        sku_index = {'A': 0, 'B': 1, 'C': 2}
+        skus = "ABCAA" * checkout_solution.COUNT_PASS_THRESHOLD
+        self.assertEqual(
+            checkout_solution.count_items(skus, sku_index),
+            [3 * checkout_solution.COUNT_PASS_THRESHOLD,
+             checkout_solution.COUNT_PASS_THRESHOLD,
+             checkout_solution.COUNT_PASS_THRESHOLD],
+        )
+        self.assertEqual(
+            checkout_solution.count_items(skus + "x", sku_index), None)
+
+
+class TestEvaluateDealsClosedForm(unittest.TestCase):
+    def test_evaluate_deals(self):
+        ordered_deals = (
+            checkout_solution.Deal('5A for 200', ((0, 5),), 50, 200),
+            checkout_solution.Deal('3A for 130', ((0, 3),), 20, 130),
+            checkout_solution.Deal('2E get one B free', ((1, 1), (2, 2)), 30, 80),
+        )
+        deals_cost, counts = checkout_solution.evaluate_deals(
+            [1004, 3, 5], ordered_deals)
+        self.assertEqual(deals_cost, 200 * 200 + 130 + 2 * 80)
+        self.assertEqual(counts, [1, 1, 1])
+
+
 class TestRequirementsSatisfied(unittest.TestCase):
     def test_requirements_satisfied(self):
         items_counter = Counter({'A': 3})
@@ -114,6 +569,13 @@ class TestCheckout(unittest.TestCase):
         self.assertEqual(checkout_solution.checkout("AAAAAA"), 250) # 6
         self.assertEqual(checkout_solution.checkout("AAAAAAAA"), 330) # 8
 
+    def test_checkout_large_quantities(self):
+        self.assertEqual(checkout_solution.checkout("A" * 1000), 200 * 200)
+        self.assertEqual(checkout_solution.checkout("A" * 1003), 40130)
+        self.assertEqual(checkout_solution.checkout("F" * 31), 10 * 20 + 10)
+        self.assertEqual(
+            checkout_solution.checkout("E" * 100 + "B" * 60), 100 * 40 + 5 * 45)
+
     def test_checkout_multiple_items(self):
         self.assertEqual(checkout_solution.checkout("AB"), 80)
         self.assertEqual(checkout_solution.checkout("ABCD"), 115)
@@ -127,6 +589,79 @@ class TestCheckout(unittest.TestCase):
     def test_get_one_free_same_item(self):
         self.assertEqual(checkout_solution.checkout("FFF"), 20)
 
+    def test_checkout_invalid(self):
+        self.assertEqual(checkout_solution.checkout("a"), -1)
+        self.assertEqual(checkout_solution.checkout("AAA-"), -1)
+
+
+class TestCheckoutMany(unittest.TestCase):
+    def test_checkout_many(self):
+        baskets = ["", "A", "AAAABBBC", "EEB", "x", "A", "FFF", "AAA-"]
+        self.assertEqual(
+            checkout_solution.checkout_many(baskets),
+            [checkout_solution.checkout(skus) for skus in baskets],
+        )
+
+    def test_checkout_many_generator(self):
+        baskets = (skus for skus in ["AB", "ABCD"])
+        self.assertEqual(checkout_solution.checkout_many(baskets), [80, 115])
+
+    def test_checkout_many_bounded(self):
+        cache_size = checkout_solution.CHECKOUT_MANY_CACHE_SIZE
+        checkout_solution.CHECKOUT_MANY_CACHE_SIZE = 2
+        try:
+            baskets = ["A", "B", "A", "C", "D", "A", "x", "A"]
+            self.assertEqual(
+                checkout_solution.checkout_many(baskets),
+                [50, 30, 50, 20, 15, 50, -1, 50],
+            )
+        finally:
+            checkout_solution.CHECKOUT_MANY_CACHE_SIZE = cache_size
+
+
+class TestCheckoutStream(unittest.TestCase):
+    def test_checkout_stream_file(self):
+        self.assertEqual(
+            checkout_solution.checkout_stream(io.StringIO(u"AAAABBBC")),
+            180 + 75 + 20,
+        )
+        self.assertEqual(
+            checkout_solution.checkout_stream(io.BytesIO(b"EEB")), 80)
+        self.assertEqual(checkout_solution.checkout_stream(io.BytesIO(b"")), 0)
+
+    def test_checkout_stream_chunks(self):
+        chunks = ["A" * 400, "EE", "", "B" * 3]
+        self.assertEqual(
+            checkout_solution.checkout_stream(iter(chunks)),
+            checkout_solution.checkout("".join(chunks)),
+        )
+
+    def test_checkout_stream_characters(self):
+        skus = "ABCDEFGHIJKLMNOPQRSTUVWXYZ" * 50
+        self.assertEqual(
+            checkout_solution.checkout_stream(item for item in skus),
+            checkout_solution.checkout(skus),
+        )
+        self.assertEqual(
+            checkout_solution.checkout_stream(
+                (item for item in skus), exact=True),
+            checkout_solution.checkout(skus, exact=True),
+        )
+
+    def test_checkout_stream_invalid(self):
+        self.assertEqual(
+            checkout_solution.checkout_stream(iter(["AB", "C-"])), -1)
+        self.assertEqual(
+            checkout_solution.checkout_stream(io.BytesIO(b"AB\xff")), -1)
+
+    def test_iter_chunks(self):
+        chunks = list(checkout_solution.iter_chunks(
+            io.StringIO(u"ABCDEFG"), chunk_size=3))
+        self.assertEqual(chunks, ["ABC", "DEF", "G"])
+        chunks = list(checkout_solution.iter_chunks(
+            iter("ABCDEFG"), chunk_size=3))
+        self.assertEqual(chunks, ["ABC", "DEF", "G"])
+
 
 # Cannot use mock in online IDE... but I would test that this scenario doesn't apply the deal
 #    def test_get_one_free_same_item_not_satisfied(self):
@@ -135,20 +670,89 @@ class TestCheckout(unittest.TestCase):
 #            checkout_solution.checkout("FF")
 #            mocked.assert_called_once_with(Counter({'F': 2}), {})
 
-# ignore this issue for now, will try to solve later
-#class TestEvaluateDeals(unittest.TestCase):
-#    def test_choose_optimal_deal(self):
-#        ordered_deals = [
-#            ("2E get one B free", ["2E", "B"], 30, 80),
-#            ("3B for 69", ["3B"], 21, 69),
-#            ("3E for 100", ["3E"], 20, 100),
-#        ]
-#        items_counter = Counter({'B': 3, 'E': 3})
-#
-#        deals_cost, _ = checkout_solution.evaluate_deals(items_counter, ordered_deals)
-#        optimal_deals_cost = 69 + 100 # won't work...
-#        self.assertEqual(deals_cost, optimal_deals_cost)
-        
 
+class TestEvaluateDeals(unittest.TestCase):
+    ordered_deals = (
+        checkout_solution.Deal("2E get one B free", ((0, 1), (1, 2)), 30, 80),
+        checkout_solution.Deal("3B for 69", ((0, 3),), 21, 69),
+        checkout_solution.Deal("3E for 100", ((1, 3),), 20, 100),
+    )
+    prices = (30, 40)
+
+    def test_greedy_deal(self):
+        deals_cost, counts = checkout_solution.evaluate_deals(
+            [3, 3], self.ordered_deals)
+        self.assertEqual(deals_cost, 80)
+        self.assertEqual(counts, [2, 1])
+
+    def test_choose_optimal_deal(self):
+        total_cost = checkout_solution.solve_deals_exact(
+            [3, 3], self.ordered_deals, self.prices)
+        optimal_deals_cost = 69 + 100
+        self.assertEqual(total_cost, optimal_deals_cost)
+
+    def test_exact_no_deals_apply(self):
+        total_cost = checkout_solution.solve_deals_exact(
+            [2, 1], self.ordered_deals, self.prices)
+        self.assertEqual(total_cost, 2 * 30 + 40)
+
+
+class TestGroupInteractingDeals(unittest.TestCase):
+    def test_group_interacting_deals(self):
+        deals = [
+            checkout_solution.Deal("2E get one B free", ((1, 1), (4, 2)), 30, 80),
+            checkout_solution.Deal("3A for 130", ((0, 3),), 20, 130),
+            checkout_solution.Deal("2B for 45", ((1, 2),), 15, 45),
+        ]
+        self.assertEqual(
+            checkout_solution.group_interacting_deals(deals),
+            [((0,), [deals[1]]), ((1, 4), [deals[0], deals[2]])],
+        )
 
 
+class TestCheckoutExact(unittest.TestCase):
+    def test_checkout_exact(self):
+        self.assertEqual(checkout_solution.checkout("", exact=True), 0)
+        self.assertEqual(checkout_solution.checkout("x", exact=True), -1)
+        self.assertEqual(checkout_solution.checkout("EEB", exact=True), 80)
+        self.assertEqual(
+            checkout_solution.checkout("A" * 1003, exact=True), 40130)
+
+    def test_checkout_exact_never_worse(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            skus = ''.join(
+                rng.choice('ABEFHNMQRUV') for _ in range(rng.randint(0, 25)))
+            self.assertLessEqual(
+                checkout_solution.checkout(skus, exact=True),
+                checkout_solution.checkout(skus),
+            )
+
+    def test_solve_group_exact_matches_search(self):
+        deals = TestEvaluateDeals.ordered_deals
+        prices = TestEvaluateDeals.prices
+        for b_count in range(10):
+            for e_count in range(10):
+                # every number of applications of every deal
+                best = b_count * prices[0] + e_count * prices[1]
+                for free_b in range(5):
+                    for b_for in range(4):
+                        for e_for in range(4):
+                            b_left = b_count - free_b - 3 * b_for
+                            e_left = e_count - 2 * free_b - 3 * e_for
+                            if b_left >= 0 and e_left >= 0:
+                                best = min(best, (
+                                    80 * free_b + 69 * b_for + 100 * e_for +
+                                    b_left * prices[0] + e_left * prices[1]))
+                self.assertEqual(
+                    checkout_solution.solve_group_exact(
+                        [b_count, e_count], (0, 1), deals, prices),
+                    best)
+
+    def test_checkout_exact_large_basket(self):
+        # the search is linear in the basket size for two deal groups,
+        # benchmarks/suite.py times it
+        skus = 'E' * 100000 + 'B' * 100000
+        self.assertEqual(
+            checkout_solution.checkout(skus, exact=True),
+            checkout_solution.checkout(skus))
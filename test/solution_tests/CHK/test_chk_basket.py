@@ -0,0 +1,77 @@
+import random
+import unittest
+
+from solutions.CHK import checkout_solution
+from solutions.CHK.checkout_basket import Basket
+
+
+class TestBasket(unittest.TestCase):
+    def test_add(self):
+        basket = Basket()
+        self.assertEqual(basket.total(), 0)
+        for sku in "AAAABBBC":
+            basket.add(sku)
+        self.assertEqual(basket.total(), 180 + 75 + 20)
+        self.assertEqual(len(basket), 8)
+
+    def test_remove(self):
+        basket = Basket()
+        for sku in "EEB":
+            basket.add(sku)
+        self.assertEqual(basket.total(), 80)
+        basket.remove("E")
+        self.assertEqual(basket.total(), 70)
+        self.assertRaises(ValueError, basket.remove, "A")
+
+    def test_undo(self):
+        basket = Basket()
+        basket.add("F")
+        basket.add("F")
+        basket.add("F")
+        basket.remove("F")
+        self.assertEqual(basket.undo(), "F")
+        self.assertEqual(basket.total(), 20)
+        basket.undo()
+        self.assertEqual(basket.total(), 20)
+        basket.undo()
+        basket.undo()
+        self.assertEqual(basket.total(), 0)
+        self.assertRaises(IndexError, basket.undo)
+
+    def test_unknown_item(self):
+        basket = Basket()
+        basket.add("A")
+        basket.add("x")
+        self.assertEqual(basket.total(), -1)
+        basket.remove("x")
+        self.assertEqual(basket.total(), 50)
+
+    def test_matches_checkout(self):
+        rng = random.Random(0)
+        for exact in (False, True):
+            basket = Basket(exact=exact)
+            items = []
+            history = []
+            for _ in range(500):
+                action = rng.random()
+                if action < 0.6 or not items:
+                    sku = rng.choice("ABCDEFHKMNPQRUVx")
+                    basket.add(sku)
+                    items.append(sku)
+                    history.append((sku, 1))
+                elif action < 0.8 or not history:
+                    sku = rng.choice(items)
+                    basket.remove(sku)
+                    items.remove(sku)
+                    history.append((sku, -1))
+                else:
+                    sku, change = history.pop()
+                    self.assertEqual(basket.undo(), sku)
+                    if change > 0:
+                        items.remove(sku)
+                    else:
+                        items.append(sku)
+                self.assertEqual(
+                    basket.total(),
+                    checkout_solution.checkout(''.join(items), exact=exact),
+                )
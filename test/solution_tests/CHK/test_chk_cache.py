@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from solutions.CHK import checkout_cache, checkout_solution
+
+
+class TestPriceCache(unittest.TestCase):
+    def tearDown(self):
+        checkout_cache.disable_price_cache()
+
+    def test_same_items_share_entry(self):
+        cache = checkout_cache.enable_price_cache(maxsize=2)
+        self.assertEqual(checkout_solution.checkout("AB"), 80)
+        self.assertEqual(checkout_solution.checkout("BA"), 80)
+        self.assertEqual(checkout_solution.checkout("BA", exact=True), 80)
+        self.assertEqual(checkout_solution.checkout("x"), -1)
+        self.assertEqual(cache.stats(), {
+            'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 2, 'evictions': 0,
+        })
+
+    def test_eviction(self):
+        cache = checkout_cache.enable_price_cache(maxsize=2)
+        for skus in ("A", "B", "A", "C", "B"):
+            checkout_solution.checkout(skus)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(
+            (cache.hits, cache.misses, cache.evictions), (1, 4, 2))
+
+    def test_catalog_change_clears(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'prices.csv')
+            with open(path, 'w') as prices_file:
+                prices_file.write('A;50;\n')
+            old_catalog = checkout_solution.compile_catalog(path)
+            with open(path, 'w') as prices_file:
+                prices_file.write('A;60;\nB;10;\n')
+            new_catalog = checkout_solution.compile_catalog(path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        cache = checkout_cache.PriceCache()
+        self.assertEqual(cache.price([2], old_catalog), 100)
+        self.assertEqual(cache.price([2], old_catalog), 100)
+        self.assertEqual(cache.price([2, 0], new_catalog), 120)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
@@ -0,0 +1,67 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from solutions.CHK import checkout_codegen
+from solutions.CHK import checkout_solution
+
+
+class TestCheckoutCodegen(unittest.TestCase):
+    def assert_matches_checkout(self, baskets):
+        self.assertEqual(
+            checkout_codegen.checkout_many(baskets),
+            [checkout_solution.checkout(skus) for skus in baskets],
+        )
+
+    def test_checkout_cases(self):
+        baskets = [
+            "", "A", "B", "AAA", "AAAAAAAA", "ABCD", "AAAABBBC", "EEB",
+            "EEEEBB", "FFF", "NNNM", "RRRQQQQ", "a", "AAA-", "A" * 1003,
+            "F" * 31, "E" * 100 + "B" * 60,
+        ]
+        self.assert_matches_checkout(baskets)
+        for skus in baskets:
+            self.assertEqual(
+                checkout_codegen.checkout(skus),
+                checkout_solution.checkout(skus))
+
+    def test_checkout_random(self):
+        rng = random.Random(0)
+        alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        baskets = []
+        for _ in range(2000):
+            skus = ''.join(
+                rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            if rng.random() < 0.05:
+                skus += rng.choice("a-1 ")
+            baskets.append(skus)
+        self.assert_matches_checkout(baskets)
+
+    def test_pricer_does_not_change_counts(self):
+        catalog = checkout_solution.get_catalog()
+        counts = catalog.tokenizer.count("AAABBEEQQQRRR")
+        price = checkout_codegen.get_pricer(catalog)
+        self.assertEqual(
+            price(counts), checkout_solution.price_counts(list(counts), catalog))
+        self.assertEqual(counts, catalog.tokenizer.count("AAABBEEQQQRRR"))
+
+    def test_get_pricer_per_version(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'prices.csv')
+            with open(path, 'w') as prices_file:
+                prices_file.write('A;50;3A for 130\nB;30;2A get one B free\n')
+            catalog = checkout_solution.compile_catalog(path)
+            price = checkout_codegen.get_pricer(catalog)
+            self.assertIs(checkout_codegen.get_pricer(catalog), price)
+            self.assertEqual(price(catalog.tokenizer.count("AAB")), 100)
+
+            with open(path, 'w') as prices_file:
+                prices_file.write('A;60;\n')
+            catalog = checkout_solution.compile_catalog(path)
+            price = checkout_codegen.get_pricer(catalog)
+            self.assertEqual(price(catalog.tokenizer.count("AA")), 120)
+        finally:
+            shutil.rmtree(tmp_dir)
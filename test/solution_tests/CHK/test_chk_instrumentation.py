@@ -0,0 +1,63 @@
+import unittest
+
+from solutions.CHK import (
+    checkout_cache, checkout_instrumentation, checkout_solution)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        checkout_instrumentation.disable_instrumentation()
+
+    def test_stage_stats(self):
+        stats = checkout_instrumentation.enable_instrumentation()
+        checkout_solution.invalidate_catalog()
+        self.assertEqual(checkout_solution.checkout("AAAABBBC"), 275)
+        self.assertEqual(checkout_solution.checkout("EEB", exact=True), 80)
+        self.assertEqual(checkout_solution.checkout("x"), -1)
+        self.assertEqual(checkout_solution.checkout(""), 0)
+
+        calls = dict(
+            (stage, values[0]) for stage, values in stats.stages.items())
+        self.assertEqual(calls, {
+            'catalog': 4,
+            'checkout': 4,
+            'compile_catalog': 1,
+            'components': 2,
+            'count_items': 3,
+            'quantity_pricers': 2,
+            'remaining_items': 2,
+        })
+        summary = stats.summary().splitlines()
+        self.assertEqual(len(summary), 1 + len(calls))
+        self.assertTrue(summary[2].startswith('checkout'))
+
+    def test_stage_hook(self):
+        recorded = []
+
+        def hook(stage, seconds):
+            recorded.append(stage)
+
+        checkout_instrumentation.add_stage_hook(hook)
+        checkout_solution.checkout("A")
+        checkout_instrumentation.remove_stage_hook(hook)
+        checkout_solution.checkout("A")
+        self.assertEqual(recorded[-1], 'checkout')
+        self.assertEqual(recorded.count('checkout'), 1)
+
+    def test_price_cache_with_instrumentation(self):
+        def cache_stats():
+            cache = checkout_cache.enable_price_cache()
+            try:
+                for skus in ("AAB", "ABA", "EEB", "AAB"):
+                    checkout_solution.checkout(skus)
+                return cache.stats()
+            finally:
+                checkout_cache.disable_price_cache()
+
+        plain = cache_stats()
+        stats = checkout_instrumentation.enable_instrumentation()
+        self.assertEqual(cache_stats(), plain)
+        self.assertEqual((plain['hits'], plain['misses']), (2, 2))
+        # only cache misses reach the pricing stages
+        self.assertEqual(stats.stages['components'][0], 2)
+        self.assertEqual(stats.stages['count_items'][0], 4)
@@ -0,0 +1,53 @@
+import random
+import unittest
+
+from solutions.CHK import checkout_solution
+
+try:
+    from solutions.CHK import checkout_numpy
+except ImportError:
+    # numpy is optional
+    checkout_numpy = None
+
+
+@unittest.skipIf(checkout_numpy is None, "numpy is not installed")
+class TestCheckoutNumpy(unittest.TestCase):
+    def assert_matches_checkout(self, baskets):
+        self.assertEqual(
+            checkout_numpy.checkout_many(baskets),
+            [checkout_solution.checkout(skus) for skus in baskets],
+        )
+
+    def test_checkout_cases(self):
+        self.assert_matches_checkout([
+            "", "A", "B", "C", "D", "AA", "AAA", "AAAA", "AAAAA", "AAAAAA",
+            "AAAAAAAA", "AB", "ABCD", "AAAABBBC", "EEB", "FFF", "a", "AAA-",
+            "A" * 1003, "F" * 31, "E" * 100 + "B" * 60,
+        ])
+
+    def test_checkout_random(self):
+        rng = random.Random(0)
+        alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        baskets = []
+        for _ in range(2000):
+            skus = ''.join(
+                rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            if rng.random() < 0.05:
+                skus += rng.choice("a-1 ")
+            baskets.append(skus)
+        self.assert_matches_checkout(baskets)
+
+    def test_checkout_across_chunks(self):
+        chunk_size = checkout_numpy.CHUNK_SIZE
+        checkout_numpy.CHUNK_SIZE = 3
+        try:
+            self.assert_matches_checkout(["AB", "x", "", "EEB", "AAAAA", "Q"])
+        finally:
+            checkout_numpy.CHUNK_SIZE = chunk_size
+
+    def test_count_baskets(self):
+        catalog = checkout_solution.get_catalog()
+        counts, invalid = checkout_numpy.count_baskets(["AAB", "Zz"], catalog)
+        self.assertEqual(counts[0].tolist()[:3], [2, 1, 0])
+        self.assertEqual(counts[1].tolist()[-1], 1)
+        self.assertEqual(invalid.tolist(), [False, True])
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from solutions.CHK import checkout_parallel
+from solutions.CHK import checkout_solution
+
+
+class TestCheckoutParallel(unittest.TestCase):
+    def test_checkout_parallel(self):
+        baskets = ["", "A", "AAAABBBC", "EEB", "x", "FFF", "AAA-"] * 20
+        self.assertEqual(
+            checkout_parallel.checkout_parallel(
+                baskets, processes=2, chunk_size=8),
+            [checkout_solution.checkout(skus) for skus in baskets],
+        )
+
+    def test_checkout_parallel_exact(self):
+        baskets = iter(["EEBBB", "A" * 1003])
+        self.assertEqual(
+            checkout_parallel.checkout_parallel(
+                baskets, processes=1, exact=True),
+            [checkout_solution.checkout("EEBBB", exact=True), 40130],
+        )
+
+    def test_checkout_parallel_empty(self):
+        self.assertEqual(
+            checkout_parallel.checkout_parallel([], processes=1), [])
+
+    def test_missing_catalog_raises(self):
+        cwd = os.getcwd()
+        tmp_dir = tempfile.mkdtemp()
+        os.chdir(tmp_dir)
+        try:
+            with self.assertRaises(EnvironmentError):
+                checkout_parallel.checkout_parallel(["A"], processes=1)
+        finally:
+            os.chdir(cwd)
+            os.rmdir(tmp_dir)
+
+    def test_worker_raises_catalog_error_from_first_chunk(self):
+        path = os.path.join(tempfile.gettempdir(), 'missing', 'prices.csv')
+        checkout_parallel._init_worker(path)
+        try:
+            with self.assertRaises(EnvironmentError):
+                checkout_parallel._price_chunk((["A"], False))
+        finally:
+            checkout_parallel._worker_path = None
+            checkout_parallel._worker_error = None